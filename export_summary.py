@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+from lib import (
+        set_summary_store,
+        BaseLogger
+        )
+
+
+logger = BaseLogger.get_logger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse options for exporting summary.
+
+    Returns:
+        argparse.Namespace: arguments
+    """
+    parser = argparse.ArgumentParser(description='Export summary of metrics in summary.db into csv')
+    parser.add_argument('--summary_dir', type=str, required=True, help='directory which contains summary.db, eg. results/trial/summary')
+    parser.add_argument('--csvpath',     type=str, default=None, help='path to csv (Default: summary.csv in summary_dir)')
+    args = parser.parse_args()
+    return args
+
+
+def main(args: argparse.Namespace) -> None:
+    set_summary_store(args.summary_dir).export(args.csvpath)
+
+
+if __name__ == '__main__':
+    try:
+        logger.info('\nExporting started.\n')
+
+        args = parse_args()
+        main(args)
+
+    except Exception as e:
+        logger.error(e, exc_info=True)
+
+    else:
+        logger.info('\nExporting finished.\n')
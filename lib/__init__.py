@@ -7,9 +7,18 @@ from .options import (
     save_parameter,
     print_parameter
     )
-from .dataloader import create_dataloader
-from .framework import create_model
-from .metrics import set_eval
+from .dataloader import create_dataloader, set_sampler_epoch
+from .distributed import (
+    get_world_size,
+    set_master_address,
+    setup_process_group,
+    cleanup_process_group,
+    is_main_process
+    )
+from .imageshard import pack_image_shard
+from .framework import create_model, iterate_weights
+from .metrics import set_eval, set_streaming_eval, read_likelihood
+from .summary import set_summary_store
 from .logger import BaseLogger
 
 __all__ = [
@@ -18,7 +27,18 @@ __all__ = [
             'print_parameter',
             'save_parameter',
             'create_dataloader',
+            'set_sampler_epoch',
+            'get_world_size',
+            'set_master_address',
+            'setup_process_group',
+            'cleanup_process_group',
+            'is_main_process',
+            'pack_image_shard',
             'create_model',
+            'iterate_weights',
             'set_eval',
+            'set_streaming_eval',
+            'read_likelihood',
+            'set_summary_store',
             'BaseLogger'
         ]
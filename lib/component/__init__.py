@@ -5,12 +5,17 @@ from .net import create_net
 from .criterion import set_criterion
 from .optimizer import set_optimizer
 from .loss import set_loss_store
-from .likelihood import set_likelihood
+from .likelihood import set_likelihood, set_likelihood_writer
+from .augmentation import set_image_transform
+from .precision import set_mixed_precision
 
 __all__ = [
             'create_net',
             'set_criterion',
             'set_optimizer',
             'set_loss_store',
-            'set_likelihood'
+            'set_likelihood',
+            'set_likelihood_writer',
+            'set_image_transform',
+            'set_mixed_precision'
         ]
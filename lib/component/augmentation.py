@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import torch
+import torch.nn.functional as F
+import torchvision.transforms as transforms
+
+
+class PrivateBatchAugment:
+    """
+    Augmentation defined privately, which is applied to a batch of image on device.
+    This corresponds to PrivateAugment.xray_augs_list in dataloader.py,
+    but random parameters are drawn for each sample of batch.
+    """
+    # For X-ray photo.
+    degrees = 3.0                  # RandomAffine(degrees=(-3, 3))
+    translate = (0.02, 0.02)       # RandomAffine(translate=(0.02, 0.02))
+    sharpness_factor = 2.0         # RandomAdjustSharpness(sharpness_factor=2)
+    sharpness_p = 0.5
+    autocontrast_p = 0.5           # RandomAutocontrast()
+
+    @classmethod
+    def random_affine(cls, image: torch.FloatTensor) -> torch.FloatTensor:
+        """
+        Rotate and translate each image by random angle and shift.
+
+        Args:
+            image (torch.FloatTensor): batch of image, whose shape is (N, C, H, W)
+
+        Returns:
+            torch.FloatTensor: affined image
+        """
+        batch_size, _, height, width = image.shape
+        device = image.device
+
+        angle = torch.empty(batch_size, device=device).uniform_(-cls.degrees, cls.degrees) * (math.pi / 180)
+        # Translation in pixels is rounded as RandomAffine does, then converted into normalized coordinates.
+        max_dx = cls.translate[0] * width
+        max_dy = cls.translate[1] * height
+        tx = torch.round(torch.empty(batch_size, device=device).uniform_(-max_dx, max_dx)) * (2 / width)
+        ty = torch.round(torch.empty(batch_size, device=device).uniform_(-max_dy, max_dy)) * (2 / height)
+
+        # theta maps coordinates of output into those of input, ie. inverse of rotation and translation.
+        # Aspect ratio is considered since normalized coordinates are scaled differently in x and y.
+        cos = torch.cos(angle)
+        sin = torch.sin(angle)
+        a11 = cos
+        a12 = sin * (height / width)
+        a21 = -sin * (width / height)
+        a22 = cos
+        theta = torch.stack([
+                            torch.stack([a11, a12, -(a11 * tx + a12 * ty)], dim=1),
+                            torch.stack([a21, a22, -(a21 * tx + a22 * ty)], dim=1)
+                            ], dim=1)
+
+        grid = F.affine_grid(theta, list(image.shape), align_corners=False)
+        affined = F.grid_sample(image, grid, mode='nearest', padding_mode='zeros', align_corners=False)
+        return affined
+
+    @classmethod
+    def random_adjust_sharpness(cls, image: torch.FloatTensor) -> torch.FloatTensor:
+        """
+        Sharpen randomly chosen images.
+
+        Args:
+            image (torch.FloatTensor): batch of image in [0, 1], whose shape is (N, C, H, W)
+
+        Returns:
+            torch.FloatTensor: sharpened image
+        """
+        num_channels = image.shape[1]
+        kernel = torch.tensor([[1.0, 1.0, 1.0], [1.0, 5.0, 1.0], [1.0, 1.0, 1.0]], device=image.device) / 13.0
+        kernel = kernel.expand(num_channels, 1, 3, 3)
+
+        # Pixels at border are kept as they are.
+        degenerate = image.clone()
+        degenerate[..., 1:-1, 1:-1] = F.conv2d(image, kernel, groups=num_channels)
+        sharpened = (cls.sharpness_factor * image + (1.0 - cls.sharpness_factor) * degenerate).clamp(0.0, 1.0)
+
+        is_applied = (torch.rand(image.shape[0], device=image.device) < cls.sharpness_p).reshape(-1, 1, 1, 1)
+        image = torch.where(is_applied, sharpened, image)
+        return image
+
+    @classmethod
+    def random_autocontrast(cls, image: torch.FloatTensor) -> torch.FloatTensor:
+        """
+        Maximize contrast of randomly chosen images for each channel.
+
+        Args:
+            image (torch.FloatTensor): batch of image in [0, 1], whose shape is (N, C, H, W)
+
+        Returns:
+            torch.FloatTensor: image
+        """
+        minimum = image.amin(dim=(-2, -1), keepdim=True)
+        maximum = image.amax(dim=(-2, -1), keepdim=True)
+        is_flat = (minimum == maximum)
+        minimum = torch.where(is_flat, torch.zeros_like(minimum), minimum)
+        maximum = torch.where(is_flat, torch.ones_like(maximum), maximum)
+        contrasted = ((image - minimum) / (maximum - minimum)).clamp(0.0, 1.0)
+
+        is_applied = (torch.rand(image.shape[0], device=image.device) < cls.autocontrast_p).reshape(-1, 1, 1, 1)
+        image = torch.where(is_applied, contrasted, image)
+        return image
+
+    @classmethod
+    def xray_augs(cls, image: torch.FloatTensor) -> torch.FloatTensor:
+        """
+        Apply augmentation for X-ray photo in the same order as PrivateAugment.xray_augs_list.
+
+        Args:
+            image (torch.FloatTensor): batch of image in [0, 1], whose shape is (N, C, H, W)
+
+        Returns:
+            torch.FloatTensor: augmented image
+        """
+        image = cls.random_affine(image)
+        image = cls.random_adjust_sharpness(image)
+        image = cls.random_autocontrast(image)
+        return image
+
+
+class BatchImageTransform:
+    """
+    Class to augment and normalize a batch of image on device.
+    Images are passed from dataloader as torch.uint8 without augmentation and normalization.
+    """
+    def __init__(
+                self,
+                augmentation: str = None,
+                normalize_image: str = None,
+                in_channel: int = None,
+                device: torch.device = None
+                ) -> None:
+        """
+        Args:
+            augmentation (str): kind of augmentation, ie. 'xrayaug', 'trivialaugwide', 'randaug', or 'no'
+            normalize_image (str): 'yes' or 'no'
+            in_channel (int): channel, or 1 or 3
+            device (torch.device): device
+        """
+        self.augmentation = augmentation
+        self.normalize_image = normalize_image
+        self.in_channel = in_channel
+        self.device = device
+
+        # Policies are applied to each image on device, since their operations are chosen for each image.
+        self.policy = None
+        if self.augmentation == 'trivialaugwide':
+            self.policy = transforms.TrivialAugmentWide()
+        elif self.augmentation == 'randaug':
+            self.policy = transforms.RandAugment()
+
+        if self.in_channel == 1:
+            _mean, _std = [0.5], [0.5]
+        else:
+            # ie. self.in_channel == 3
+            _mean, _std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+        self.mean = torch.tensor(_mean, device=self.device).reshape(1, -1, 1, 1)
+        self.std = torch.tensor(_std, device=self.device).reshape(1, -1, 1, 1)
+
+    def _augment(self, image: torch.ByteTensor) -> torch.FloatTensor:
+        """
+        Augment image, and convert it into [0, 1].
+
+        Args:
+            image (torch.ByteTensor): batch of image
+
+        Returns:
+            torch.FloatTensor: augmented image
+        """
+        if self.policy is not None:
+            image = torch.stack([self.policy(_image) for _image in image])
+
+        image = image.to(torch.float32).div(255)
+
+        if self.augmentation == 'xrayaug':
+            image = PrivateBatchAugment.xray_augs(image)
+        return image
+
+    def __call__(self, image: torch.ByteTensor, isTrain: bool = None) -> torch.FloatTensor:
+        """
+        Augment image when training, and normalize it.
+
+        Args:
+            image (torch.ByteTensor): batch of image on device, whose shape is (N, C, H, W)
+            isTrain (bool): True if training
+
+        Returns:
+            torch.FloatTensor: image to be input into network
+        """
+        if isTrain:
+            image = self._augment(image)
+        else:
+            image = image.to(torch.float32).div(255)
+
+        if self.normalize_image == 'yes':
+            image = image.sub(self.mean).div(self.std)
+        return image
+
+
+def set_image_transform(
+                        augmentation: str = None,
+                        normalize_image: str = None,
+                        in_channel: int = None,
+                        device: torch.device = None
+                        ) -> BatchImageTransform:
+    """
+    Set transform of image on device.
+
+    Args:
+        augmentation (str): kind of augmentation
+        normalize_image (str): 'yes' or 'no'
+        in_channel (int): channel, or 1 or 3
+        device (torch.device): device
+
+    Returns:
+        BatchImageTransform: transform of image
+    """
+    return BatchImageTransform(
+                            augmentation=augmentation,
+                            normalize_image=normalize_image,
+                            in_channel=in_channel,
+                            device=device
+                            )
@@ -3,7 +3,7 @@
 
 import torch
 import torch.nn as nn
-from typing import Dict, Union
+from typing import Dict, Tuple, Union
 
 # Alias of typing
 # eg. {'labels': {'label_A: torch.Tensor([0, 1, ...]), ...}}
@@ -77,17 +77,21 @@ class Regularization:
 
 class NegativeLogLikelihood(nn.Module):
     """
-    Class to calculate RMSE.
+    Class to calculate Negative Log Likelihood of Cox partial likelihood.
     """
-    def __init__(self, device: torch.device) -> None:
+    def __init__(self, device: torch.device, ties: str = 'breslow') -> None:
         """
         Args:
             device (torch.device): device
+            ties (str): method to handle tied periods of events, 'breslow' or 'efron'. Defaults to 'breslow'.
         """
         super().__init__()
+        assert (ties in ['breslow', 'efron']), f"Invalid ties: {ties}."
+
         self.L2_reg = 0.05
         self.reg = Regularization(order=2, weight_decay=self.L2_reg)
         self.device = device
+        self.ties = ties
 
     def forward(
                 self,
@@ -97,6 +101,30 @@ class NegativeLogLikelihood(nn.Module):
                 network: nn.Module
                 ) -> torch.FloatTensor:
         """
+        Calculates Negative Log Likelihood in float32 even in mixed precision,
+        since exp and log easily overflow or underflow in lower precision.
+
+        Args:
+            output (torch.FloatTensor): prediction value, ie risk prediction
+            label (torch.IntTensor): occurrence of event
+            periods (torch.FloatTensor): period
+            network (nn.Network): network
+
+        Returns:
+            torch.FloatTensor: Negative Log Likelihood
+        """
+        with torch.autocast(device_type=output.device.type, enabled=False):
+            loss = self._cal_neg_log_likelihood(output.float(), label, periods.float(), network)
+        return loss
+
+    def _cal_neg_log_likelihood(
+                                self,
+                                output: torch.FloatTensor,
+                                label: torch.IntTensor,
+                                periods: torch.FloatTensor,
+                                network: nn.Module
+                                ) -> torch.FloatTensor:
+        """
         Calculates Negative Log Likelihood.
 
         Args:
@@ -107,24 +135,78 @@ class NegativeLogLikelihood(nn.Module):
 
         Returns:
             torch.FloatTensor: Negative Log Likelihood
+
+        Note:
+            Risk set of sample j is samples i whose period_i >= period_j, and log of mean of exp(output_i) over it is calculated.
+            By sorting samples in descending order of period, log of sum over risk set is cumulative logsumexp,
+            which costs O(n log n) instead of mask of n x n, and does not overflow.
+        """
+        _output = output.reshape(-1)
+        _label = label.reshape(-1).to(_output.dtype)
+        _periods = periods.reshape(-1)
+
+        _order = torch.argsort(_periods, descending=True)
+        _output = _output[_order]
+        _label = _label[_order]
+        _periods = _periods[_order]
+
+        # Samples of the same period share the risk set, which ends at the last of them.
+        _, _group, _group_size = torch.unique_consecutive(_periods, return_inverse=True, return_counts=True)
+        _group_end = torch.cumsum(_group_size, dim=0) - 1
+        _end = _group_end[_group]
+        _log_risk = torch.logcumsumexp(_output, dim=0)[_end]
+        _log_risk_size = torch.log((_end + 1).to(_output.dtype))
+
+        if self.ties == 'efron':
+            _log_risk = _log_risk + self._efron_correction(_output, _label, _log_risk, _group, _group_size)
+
+        _loss = _log_risk - _log_risk_size
+        num_occurs = torch.sum(_label)
+
+        # Not branched by num_occurs.item(), which waits for device to finish.
+        # To avoid zero division, set small value as loss when no event occurs.
+        neg_log_loss = -torch.sum((_output - _loss) * _label) / torch.clamp(num_occurs, min=1.0)
+        l2_loss = self.reg(network)
+        loss = torch.where(num_occurs > 0, neg_log_loss + l2_loss, torch.tensor(1e-7, device=_output.device))
+        return loss
+
+    def _efron_correction(
+                        self,
+                        output: torch.FloatTensor,
+                        label: torch.FloatTensor,
+                        log_risk: torch.FloatTensor,
+                        group: torch.LongTensor,
+                        group_size: torch.LongTensor
+                        ) -> torch.FloatTensor:
+        """
+        Calculates correction of log of sum over risk set by Efron approximation.
+        For the l-th of d tied events, exp(output) of the tied events is subtracted from the risk set by l/d.
+
+        Args:
+            output (torch.FloatTensor): prediction value sorted in descending order of period
+            label (torch.FloatTensor): occurrence of event sorted in the same order
+            log_risk (torch.FloatTensor): log of sum over risk set
+            group (torch.LongTensor): index of group of the same period
+            group_size (torch.LongTensor): the number of samples in each group
+
+        Returns:
+            torch.FloatTensor: correction to be added to log_risk, which is 0 when no tie
         """
-        mask = torch.ones(periods.shape[0], periods.shape[0]).to(self.device)  # output and mask should be on the same device.
-        mask[(periods.T - periods) > 0] = 0
+        _num_groups = group_size.shape[0]
 
-        _loss = torch.exp(output) * mask
-        # Note: torch.sum(_loss, dim=0) possibly returns nan, in particular MLP.
-        _loss = torch.sum(_loss, dim=0) / torch.sum(mask, dim=0)
-        _loss = torch.log(_loss).reshape(-1, 1)
-        num_occurs = torch.sum(label)
+        # Number of events, and sum of exp(output) of events relative to the risk set for each group.
+        _num_events = torch.zeros(_num_groups, dtype=output.dtype, device=output.device).index_add_(0, group, label)
+        _event_ratio = torch.zeros(_num_groups, dtype=output.dtype, device=output.device).index_add_(0, group, torch.exp(output - log_risk) * label)
 
-        if num_occurs.item() == 0.0:
-            loss = torch.tensor([1e-7], requires_grad=True).to(self.device)  # To avoid zero division, set small value as loss
-            return loss
-        else:
-            neg_log_loss = -torch.sum((output - _loss) * label) / num_occurs
-            l2_loss = self.reg(network)
-            loss = neg_log_loss + l2_loss
-            return loss
+        # Order of event in its group, ie. 0, 1, ..., d - 1.
+        _cum_events = torch.cumsum(label, dim=0)
+        _group_start = torch.cumsum(group_size, dim=0) - group_size
+        _events_before = _cum_events[_group_start] - label[_group_start]
+        _nth = (_cum_events - 1 - _events_before[group]).clamp(min=0) * label
+
+        _fraction = _nth / torch.clamp(_num_events[group], min=1.0)
+        correction = torch.log1p(-_fraction * _event_ratio[group])
+        return correction
 
 
 class ClsCriterion:
@@ -173,7 +255,7 @@ class ClsCriterion:
         losses = dict()
         losses['total'] = torch.tensor([0.0], requires_grad=True).to(self.device)
         for label_name in labels['labels'].keys():
-            _output = outputs[label_name]
+            _output = outputs[label_name].float()  # float32 even if in mixed precision
             _label = _labels[label_name]
             _label_loss = self.criterion(_output, _label)
             losses[label_name] = _label_loss
@@ -181,6 +263,70 @@ class ClsCriterion:
         return losses
 
 
+class FusedClsCriterion(ClsCriterion):
+    """
+    Class of criterion for classification, which calculates losses of all labels at once.
+    Outputs of labels are packed and padded into one tensor, whose shape is (N, the number of labels, the maximum number of classes).
+    """
+    def __init__(self, device: torch.device = None) -> None:
+        """
+        Args:
+            device (torch.device): device
+        """
+        super().__init__(device=device)
+
+        # Mask of valid classes in padded outputs, which is cached for number of outputs of labels.
+        self._masks = dict()
+
+    def _get_mask(self, split_sizes: Tuple[int, ...]) -> torch.BoolTensor:
+        """
+        Return mask of valid classes.
+
+        Args:
+            split_sizes (Tuple[int, ...]): number of outputs of each label
+
+        Returns:
+            torch.BoolTensor: mask, whose shape is (the number of labels, the maximum number of classes)
+        """
+        if split_sizes not in self._masks:
+            _num_classes = torch.tensor(split_sizes)
+            mask = torch.arange(max(split_sizes)).reshape(1, -1) < _num_classes.reshape(-1, 1)
+            self._masks[split_sizes] = mask.to(self.device)
+        return self._masks[split_sizes]
+
+    def __call__(
+                self,
+                outputs: Dict[str, torch.FloatTensor],
+                labels: Dict[str, LabelDict]
+                ) -> Dict[str, torch.FloatTensor]:
+        """
+        Calculate loss.
+
+        Args:
+            outputs (Dict[str, torch.FloatTensor], optional): output
+            labels (Dict[str, LabelDict]): labels
+
+        Returns:
+            Dict[str, torch.FloatTensor]: loss for each label and their total loss
+        """
+        label_names = list(labels['labels'].keys())
+        split_sizes = tuple(outputs[label_name].shape[1] for label_name in label_names)
+        mask = self._get_mask(split_sizes)
+
+        packed = torch.cat([outputs[label_name] for label_name in label_names], dim=1).float()  # float32 even if in mixed precision
+        padded = packed.new_full((packed.shape[0], *mask.shape), float('-inf'))
+        padded[:, mask] = packed
+
+        # The same as nn.CrossEntropyLoss() for each label, since exp(-inf) of padding is 0.
+        _label = torch.stack([labels['labels'][label_name] for label_name in label_names], dim=1)
+        _log_prob = torch.log_softmax(padded, dim=2)
+        _label_losses = -torch.gather(_log_prob, 2, _label.unsqueeze(2)).squeeze(2).mean(dim=0)
+
+        losses = dict(zip(label_names, torch.unbind(_label_losses)))
+        losses['total'] = _label_losses.sum().reshape(1)
+        return losses
+
+
 class RegCriterion:
     """
     Class of criterion for regression.
@@ -230,7 +376,7 @@ class RegCriterion:
         labels = {'labels': {'label_A: 1: [10, 9, ...], 'label_B': [12, 17,], ...}}
         -> losses = {total: loss_total, label_A: loss_A, label_B: loss_B, ... }
         """
-        _outputs = {label_name: _output.squeeze() for label_name, _output in outputs.items()}
+        _outputs = {label_name: _output.squeeze().float() for label_name, _output in outputs.items()}  # float32 even if in mixed precision
         _labels = {label_name: _label.to(torch.float32) for label_name, _label in labels['labels'].items()}
 
         # loss for each label and total of their losses
@@ -245,19 +391,57 @@ class RegCriterion:
         return losses
 
 
+class FusedRegCriterion(RegCriterion):
+    """
+    Class of criterion for regression, which calculates losses of all labels at once.
+    """
+    def __call__(
+                self,
+                outputs: Dict[str, torch.FloatTensor],
+                labels: Dict[str, LabelDict]
+                ) -> Dict[str, torch.FloatTensor]:
+        """
+        Calculate loss.
+
+        Args:
+            outputs (Dict[str, torch.FloatTensor], optional): output
+            labels (Dict[str, LabelDict]): labels
+
+        Returns:
+            Dict[str, torch.FloatTensor]: loss for each label and their total loss
+        """
+        label_names = list(labels['labels'].keys())
+        _output = torch.cat([outputs[label_name] for label_name in label_names], dim=1).float()  # float32 even if in mixed precision
+        _label = torch.stack([labels['labels'][label_name] for label_name in label_names], dim=1).to(torch.float32)
+
+        # Mean over samples for each label.
+        if isinstance(self.criterion, nn.MSELoss):
+            _label_losses = torch.square(_output - _label).mean(dim=0)
+        elif isinstance(self.criterion, RMSELoss):
+            _label_losses = torch.sqrt(torch.square(_output - _label).mean(dim=0) + self.criterion.eps)
+        else:
+            # ie. nn.L1Loss()
+            _label_losses = torch.abs(_output - _label).mean(dim=0)
+
+        losses = dict(zip(label_names, torch.unbind(_label_losses)))
+        losses['total'] = _label_losses.sum().reshape(1)
+        return losses
+
+
 class DeepSurvCriterion:
     """
     Class of criterion for deepsurv.
     """
-    def __init__(self, device: torch.device = None) -> None:
+    def __init__(self, device: torch.device = None, ties: str = 'breslow') -> None:
         """
         Set NegativeLogLikelihood.
 
         Args:
             device (torch.device, optional): device
+            ties (str): method to handle tied periods, 'breslow' or 'efron'
         """
         self.device = device
-        self.criterion = NegativeLogLikelihood(self.device).to(self.device)
+        self.criterion = NegativeLogLikelihood(self.device, ties=ties).to(self.device)
 
     def __call__(
                 self,
@@ -306,7 +490,9 @@ class DeepSurvCriterion:
 
 def set_criterion(
                 criterion_name: str,
-                device: torch.device
+                device: torch.device,
+                ties: str = 'breslow',
+                fused: bool = False
                 ) -> Union[ClsCriterion, RegCriterion, DeepSurvCriterion]:
     """
     Return criterion class
@@ -314,19 +500,25 @@ def set_criterion(
     Args:
         criterion_name (str): criterion name
         device (torch.device): device
+        ties (str): method to handle tied periods when NLL, 'breslow' or 'efron'
+        fused (bool): True when losses of all labels are calculated at once. Not used for NLL.
 
     Returns:
         Union[ClsCriterion, RegCriterion, DeepSurvCriterion]: criterion class
     """
 
     if criterion_name == 'CEL':
+        if fused:
+            return FusedClsCriterion(device=device)
         return ClsCriterion(device=device)
 
     elif criterion_name in ['MSE', 'RMSE', 'MAE']:
+        if fused:
+            return FusedRegCriterion(criterion_name=criterion_name, device=device)
         return RegCriterion(criterion_name=criterion_name, device=device)
 
     elif criterion_name == 'NLL':
-        return DeepSurvCriterion(device=device)
+        return DeepSurvCriterion(device=device, ties=ties)
 
     else:
         raise ValueError(f"Invalid criterion: {criterion_name}.")
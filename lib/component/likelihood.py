@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from pathlib import Path
+import numpy as np
 import pandas as pd
 import torch
-from typing import List, Dict
+from typing import List, Dict, Union
 
 
 class Likelihood:
@@ -67,30 +69,170 @@ class Likelihood:
         else:
             raise ValueError(f"Invalid task: {task}.")
 
-    def make_format(self, data: Dict, output: Dict[str, torch.Tensor]) -> pd.DataFrame:
-            """
-            Make a new DataFrame of likelihood every batch.
+    def make_columns(self, data: Dict, output: Dict[str, torch.Tensor]) -> Dict[str, np.ndarray]:
+        """
+        Make columns of likelihood of batch in order of base columns, and label and its predictions for each label.
+
+        Args:
+            data (Dict): batch data from dataloader
+            output (Dict[str, torch.Tensor]): output of model
 
-            Args:
-                data (Dict): batch data from dataloader
-                output (Dict[str, torch.Tensor]): output of model
-            """
-            _likelihood = {column_name: data[column_name] for column_name in self.base_column_list}
-            df_likelihood = pd.DataFrame(_likelihood)
+        Returns:
+            Dict[str, np.ndarray]: column name and its values
+        """
+        columns = dict()
+        for column_name in self.base_column_list:
+            _values = data[column_name]
+            if isinstance(_values, torch.Tensor):
+                columns[column_name] = _values.numpy()
+            else:
+                columns[column_name] = np.asarray(_values, dtype=object)
 
+        for label_name, pred in output.items():
             if any(data['labels']):
-                for label_name, pred in output.items():
-                    _df_label = pd.DataFrame({label_name: data['labels'][label_name].tolist()})
-                    pred = pred.to('cpu').detach().numpy().copy()
-                    _df_pred = pd.DataFrame(pred, columns=self.pred_column_list[label_name])
-                    df_likelihood = pd.concat([df_likelihood, _df_label, _df_pred], axis=1)
-                return df_likelihood
+                _label = data['labels'][label_name]
+                if _label.is_floating_point():
+                    _label = _label.to(torch.float64)
+                columns[label_name] = _label.numpy()
+
+            pred = pred.to('cpu').detach().float().numpy()  # float32 even if in mixed precision
+            for i, pred_column in enumerate(self.pred_column_list[label_name]):
+                columns[pred_column] = pred[:, i]
+        return columns
+
+    def make_format(self, data: Dict, output: Dict[str, torch.Tensor]) -> pd.DataFrame:
+        """
+        Make a new DataFrame of likelihood every batch.
+
+        Args:
+            data (Dict): batch data from dataloader
+            output (Dict[str, torch.Tensor]): output of model
+
+        Returns:
+            pd.DataFrame: likelihood of batch
+        """
+        df_likelihood = pd.DataFrame(self.make_columns(data, output))
+        return df_likelihood
+
+
+class LikelihoodWriter:
+    """
+    Class to write likelihood of batches to file in chunks.
+    Likelihood of each batch is copied into preallocated buffer of each column,
+    which is written to file when full, instead of writing each batch.
+    """
+    chunk_size = 65536  # rows
+
+    extensions = {
+                'csv': '.csv',
+                'parquet': '.parquet',
+                'feather': '.feather'
+                }
+
+    def __init__(self, likelihood: Likelihood, save_path: Path, likelihood_format: str = 'csv') -> None:
+        """
+        Args:
+            likelihood (Likelihood): likelihood
+            save_path (Path): path to likelihood without extension
+            likelihood_format (str): 'csv', 'parquet', or 'feather'. Defaults to 'csv'.
+        """
+        assert (likelihood_format in self.extensions), f"Invalid likelihood format: {likelihood_format}."
+
+        self.likelihood = likelihood
+        self.likelihood_format = likelihood_format
+        # Extension is appended, since name of weight may have dots, eg. likelihood_lr0.001.
+        save_path = Path(save_path)
+        self.save_path = Path(save_path.parent, save_path.name + self.extensions[likelihood_format])
+
+        # Allocated at the first batch, when dtype of each column is known.
+        self.buffers = None  # Dict[str, np.ndarray]
+        self.num_rows = 0
+        self.num_written = 0
+        self._writer = None  # pyarrow.parquet.ParquetWriter or pyarrow.ipc.RecordBatchFileWriter
+
+    def _allocate(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Allocate buffer of each column.
+
+        Args:
+            columns (Dict[str, np.ndarray]): columns of the first batch
+        """
+        self.buffers = {column_name: np.empty(self.chunk_size, dtype=values.dtype) for column_name, values in columns.items()}
+
+    def write(self, data: Dict, output: Dict[str, torch.Tensor]) -> None:
+        """
+        Copy likelihood of batch into buffer, and write buffer when full.
+
+        Args:
+            data (Dict): batch data from dataloader
+            output (Dict[str, torch.Tensor]): output of model
+        """
+        self.write_columns(self.likelihood.make_columns(data, output))
+
+    def write_columns(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Copy columns of likelihood of batch into buffer, and write buffer when full.
+
+        Args:
+            columns (Dict[str, np.ndarray]): columns made by Likelihood.make_columns()
+        """
+        if self.buffers is None:
+            self._allocate(columns)
+
+        _batch_size = len(next(iter(columns.values())))
+        _start = 0
+        while _start < _batch_size:
+            _size = min(_batch_size - _start, self.chunk_size - self.num_rows)
+            for column_name, values in columns.items():
+                self.buffers[column_name][self.num_rows:self.num_rows + _size] = values[_start:_start + _size]
+            self.num_rows = self.num_rows + _size
+            _start = _start + _size
+
+            if self.num_rows == self.chunk_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Write rows in buffer to file.
+        """
+        if self.num_rows == 0:
+            return
+
+        df_chunk = pd.DataFrame({column_name: buffer[:self.num_rows] for column_name, buffer in self.buffers.items()})
+
+        if self.likelihood_format == 'csv':
+            if self.num_written == 0:
+                df_chunk.to_csv(self.save_path, index=False)
             else:
-                for label_name, pred in output.items():
-                    pred = pred.to('cpu').detach().numpy().copy()
-                    _df_pred = pd.DataFrame(pred, columns=self.pred_column_list[label_name])
-                    df_likelihood = pd.concat([df_likelihood, _df_pred], axis=1)
-                return df_likelihood
+                df_chunk.to_csv(self.save_path, mode='a', index=False, header=False)
+
+        elif self.likelihood_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.save_path, table.schema)
+            self._writer.write_table(table)
+
+        elif self.likelihood_format == 'feather':
+            # Feather is Arrow IPC file, which is written without compression so that it can be memory-mapped.
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pa.ipc.new_file(str(self.save_path), table.schema)
+            self._writer.write_table(table)
+
+        self.num_written = self.num_written + self.num_rows
+        self.num_rows = 0
+
+    def close(self) -> None:
+        """
+        Write the rest of rows, and close file.
+        """
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
 
 
 def set_likelihood(task: str, num_outputs_for_label: Dict[str, int]) -> Likelihood:
@@ -105,3 +247,18 @@ def set_likelihood(task: str, num_outputs_for_label: Dict[str, int]) -> Likeliho
             Likelihood: instance of class Likelihood
     """
     return Likelihood(task, num_outputs_for_label)
+
+
+def set_likelihood_writer(likelihood: Likelihood, save_path: Union[str, Path], likelihood_format: str = 'csv') -> LikelihoodWriter:
+    """
+    Set writer of likelihood.
+
+    Args:
+        likelihood (Likelihood): likelihood
+        save_path (Union[str, Path]): path to likelihood without extension
+        likelihood_format (str): 'csv', 'parquet', or 'feather'. Defaults to 'csv'.
+
+    Returns:
+        LikelihoodWriter: instance of class LikelihoodWriter
+    """
+    return LikelihoodWriter(likelihood, save_path, likelihood_format=likelihood_format)
@@ -5,6 +5,7 @@ from pathlib import Path
 import torch
 import pandas as pd
 from ..logger import BaseLogger
+from ..distributed import is_distributed, all_reduce_sum
 from typing import List, Dict, Union
 
 
@@ -16,7 +17,8 @@ class LabelLoss:
     Class to store loss for every bash and epoch loss of each label.
     """
     def __init__(self) -> None:
-        # Accumulate batch_loss(=loss * batch_size)
+        # Accumulate batch_loss(=loss * batch_size) on device,
+        # which is transferred to host only once when calculating epoch loss.
         self.train_batch_loss = 0.0
         self.val_batch_loss = 0.0
 
@@ -28,7 +30,7 @@ class LabelLoss:
         self.best_epoch = None           # int
         self.is_val_loss_updated = None  # bool
 
-    def get_loss(self, phase: str, target: str) -> Union[float, List[float]]:
+    def get_loss(self, phase: str, target: str) -> Union[float, torch.DoubleTensor, List[float]]:
         """
         Return loss depending on phase and target
 
@@ -37,7 +39,7 @@ class LabelLoss:
             target (str): 'batch' or 'epoch'
 
         Returns:
-            Union[float, List[float]]: batch_loss or epoch_loss
+            Union[float, torch.DoubleTensor, List[float]]: batch_loss or epoch_loss
         """
         _target = phase + '_' + target + '_loss'
         return getattr(self, _target)
@@ -51,7 +53,8 @@ class LabelLoss:
             new_batch_loss (torch.FloatTensor): batch loss calculated by criterion
             batch_size (int): batch size
         """
-        _new = new_batch_loss.item() * batch_size  # torch.FloatTensor -> float
+        # Not converted into float by item(), which waits for device to finish.
+        _new = new_batch_loss.detach().squeeze().to(torch.float64) * batch_size
         _prev = self.get_loss(phase, 'batch')
         _added = _prev + _new
         _target = phase + '_' + 'batch_loss'
@@ -138,6 +141,26 @@ class LossStore:
             _new_batch_loss = losses[label_name]
             self.label_losses[label_name].store_batch_loss(phase, _new_batch_loss, batch_size)
 
+    def _fetch_batch_loss(self) -> None:
+        """
+        Transfer batch losses accumulated on device to host all at once,
+        and sum them over all processes when distributed.
+        """
+        _targets = [(label_name, phase) for label_name in self.label_list + ['total'] for phase in ['train', 'val']]
+        _batch_losses = [self.label_losses[label_name].get_loss(phase, 'batch') for label_name, phase in _targets]
+
+        _on_device = [i for i, _batch_loss in enumerate(_batch_losses) if isinstance(_batch_loss, torch.Tensor)]
+        if _on_device != []:
+            _fetched = torch.stack([_batch_losses[i] for i in _on_device]).tolist()
+            for i, _batch_loss in zip(_on_device, _fetched):
+                _batch_losses[i] = _batch_loss
+
+        if is_distributed():
+            _batch_losses = all_reduce_sum(_batch_losses)
+
+        for (label_name, phase), _batch_loss in zip(_targets, _batch_losses):
+            setattr(self.label_losses[label_name], phase + '_' + 'batch_loss', _batch_loss)
+
     def cal_epoch_loss(self, at_epoch: int = None) -> None:
         """
         Calculate epoch loss for each phase all at once.
@@ -145,6 +168,8 @@ class LossStore:
         Args:
             at_epoch (int): epoch number
         """
+        self._fetch_batch_loss()
+
         # For each label
         for label_name in self.label_list:
             for phase in ['train', 'val']:
@@ -6,7 +6,60 @@ import torch
 import torch.nn as nn
 from torchvision.ops import MLP
 import torchvision.models as models
-from typing import Dict, Optional
+from torchvision.models.convnext import LayerNorm2d
+from typing import Dict, Optional, Union
+
+
+class FusedMultiClassifier(nn.Module):
+    """
+    Classifier for multi-label, which computes outputs of all labels by a single nn.Linear.
+    Outputs are packed in one tensor in order of labels, and label_offsets shows where each label starts.
+    """
+    def __init__(self, prefix: nn.Module = None, in_features: int = None, num_outputs_for_label: Dict[str, int] = None) -> None:
+        """
+        Args:
+            prefix (nn.Module): layers shared by all labels before nn.Linear, eg. dropout
+            in_features (int): in_features of nn.Linear
+            num_outputs_for_label (Dict[str, int]): number of outputs for each label
+        """
+        super().__init__()
+
+        self.label_names = list(num_outputs_for_label.keys())
+        self.split_sizes = list(num_outputs_for_label.values())
+
+        # eg. {'label_A': 0, 'label_B': 2, 'label_C': 5}
+        self.label_offsets = dict()
+        _offset = 0
+        for label_name, num_outputs in num_outputs_for_label.items():
+            self.label_offsets[label_name] = _offset
+            _offset = _offset + num_outputs
+
+        self.prefix = prefix
+        self.fc = nn.Linear(in_features, _offset)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Forward.
+
+        Args:
+            x (torch.Tensor): output from extractor
+
+        Returns:
+            torch.Tensor: packed output of all labels, whose shape is (N, total number of outputs)
+        """
+        return self.fc(self.prefix(x))
+
+    def split(self, packed: torch.Tensor) -> Dict[str, torch.Tensor]:
+        """
+        Split packed output into output of each label without copy.
+
+        Args:
+            packed (torch.Tensor): packed output
+
+        Returns:
+            Dict[str, torch.Tensor]: output of each label
+        """
+        return dict(zip(self.label_names, torch.split(packed, self.split_sizes, dim=1)))
 
 
 class BaseNet:
@@ -70,6 +123,33 @@ class BaseNet:
                 'ViTH14': _classifier['ViT']
                 }
 
+    # Configuration of the original classifier of each network, which is used to construct classifier for multi-label.
+    # This is the same as the one of torchvision, and avoids constructing a whole network only to look into its classifier.
+    #   in_features: in_features of nn.Linear
+    #   dropout: p of nn.Dropout before nn.Linear, only EfficientNet
+    #   layer_norm_eps: eps of LayerNorm2d before nn.Flatten and nn.Linear, only ConvNeXt
+    classifier_config = {
+                        'ResNet18': {'in_features': 512},
+                        'ResNet': {'in_features': 2048},
+                        'DenseNet': {'in_features': 2208},
+                        'EfficientNetB0': {'in_features': 1280, 'dropout': 0.2},
+                        'EfficientNetB2': {'in_features': 1408, 'dropout': 0.3},
+                        'EfficientNetB4': {'in_features': 1792, 'dropout': 0.4},
+                        'EfficientNetB6': {'in_features': 2304, 'dropout': 0.5},
+                        'EfficientNetV2s': {'in_features': 1280, 'dropout': 0.2},
+                        'EfficientNetV2m': {'in_features': 1280, 'dropout': 0.3},
+                        'EfficientNetV2l': {'in_features': 1280, 'dropout': 0.4},
+                        'ConvNeXtTiny': {'in_features': 768, 'layer_norm_eps': 1e-6},
+                        'ConvNeXtSmall': {'in_features': 768, 'layer_norm_eps': 1e-6},
+                        'ConvNeXtBase': {'in_features': 1024, 'layer_norm_eps': 1e-6},
+                        'ConvNeXtLarge': {'in_features': 1536, 'layer_norm_eps': 1e-6},
+                        'ViTb16': {'in_features': 768},
+                        'ViTb32': {'in_features': 768},
+                        'ViTl16': {'in_features': 1024},
+                        'ViTl32': {'in_features': 1024},
+                        'ViTH14': {'in_features': 1280}
+                        }
+
     mlp_config = {
                 'hidden_channels': [256, 256, 256],
                 'dropout': 0.2
@@ -223,19 +303,34 @@ class BaseNet:
         return extractor
 
     @classmethod
-    def get_classifier(cls, net_name: str) -> nn.Module:
+    def get_classifier_config(cls, net_name: str) -> Dict[str, Union[int, float]]:
+        """
+        Get configuration of classifier of network depending on net_name.
+
+        Args:
+            net_name (str): network name
+
+        Returns:
+            Dict[str, Union[int, float]]: configuration of classifier
+        """
+        if net_name not in cls.classifier_config:
+            raise ValueError(f"No specified net: {net_name}.")
+        return cls.classifier_config[net_name]
+
+    @classmethod
+    def construct_layer_norm(cls, net_name: str) -> LayerNorm2d:
         """
-        Get classifier of network depending on net_name.
+        Construct LayerNorm2d in classifier of ConvNeXt.
 
         Args:
             net_name (str): network name
 
         Returns:
-            nn.Module: classifier of network
+            LayerNorm2d: LayerNorm2d
         """
-        net = cls.net[net_name]()
-        classifier = getattr(net, cls.classifier[net_name])
-        return classifier
+        _config = cls.get_classifier_config(net_name)
+        layer_norm = LayerNorm2d(_config['in_features'], eps=_config['layer_norm_eps'])
+        return layer_norm
 
     @classmethod
     def construct_multi_classifier(cls, net_name: str = None, num_outputs_for_label: Dict[str, int] = None) -> nn.ModuleDict:
@@ -256,15 +351,13 @@ class BaseNet:
                 classifiers[label_name] = nn.Linear(in_features, num_outputs)
 
         elif net_name.startswith('ResNet') or net_name.startswith('DenseNet'):
-            base_classifier = cls.get_classifier(net_name)
-            in_features = base_classifier.in_features
+            in_features = cls.get_classifier_config(net_name)['in_features']
             for label_name, num_outputs in num_outputs_for_label.items():
                 classifiers[label_name] = nn.Linear(in_features, num_outputs)
 
         elif net_name.startswith('EfficientNet'):
-            base_classifier = cls.get_classifier(net_name)
-            dropout = base_classifier[0].p
-            in_features = base_classifier[1].in_features
+            dropout = cls.get_classifier_config(net_name)['dropout']
+            in_features = cls.get_classifier_config(net_name)['in_features']
             for label_name, num_outputs in num_outputs_for_label.items():
                 classifiers[label_name] = nn.Sequential(
                                                         nn.Dropout(p=dropout, inplace=False),
@@ -272,10 +365,10 @@ class BaseNet:
                                                     )
 
         elif net_name.startswith('ConvNeXt'):
-            base_classifier = cls.get_classifier(net_name)
-            layer_norm = base_classifier[0]
-            flatten = base_classifier[1]
-            in_features = base_classifier[2].in_features
+            # layer_norm is shared by all labels.
+            layer_norm = cls.construct_layer_norm(net_name)
+            flatten = nn.Flatten(1)
+            in_features = cls.get_classifier_config(net_name)['in_features']
             for label_name, num_outputs in num_outputs_for_label.items():
                 # Shape is changed before nn.Linear.
                 classifiers[label_name] = nn.Sequential(
@@ -285,8 +378,7 @@ class BaseNet:
                                                     )
 
         elif net_name.startswith('ViT'):
-            base_classifier = cls.get_classifier(net_name)
-            in_features = base_classifier.head.in_features
+            in_features = cls.get_classifier_config(net_name)['in_features']
             for label_name, num_outputs in num_outputs_for_label.items():
                 classifiers[label_name] = nn.Sequential(
                                                 OrderedDict([
@@ -300,45 +392,48 @@ class BaseNet:
         multi_classifier = nn.ModuleDict(classifiers)
         return multi_classifier
 
+    @classmethod
+    def construct_fused_classifier(cls, net_name: str = None, num_outputs_for_label: Dict[str, int] = None) -> FusedMultiClassifier:
+        """
+        Construct classifier for multi-label, which computes outputs of all labels at once.
+        Layers before nn.Linear are the same as construct_multi_classifier().
+
+        Args:
+            net_name (str): network name
+            num_outputs_for_label (Dict[str, int]): number of outputs for each label
+
+        Returns:
+            FusedMultiClassifier: classifier for multi-label
+        """
+        in_features = cls.get_classifier_in_features(net_name)
+
+        if net_name.startswith('EfficientNet'):
+            dropout = cls.get_classifier_config(net_name)['dropout']
+            prefix = nn.Dropout(p=dropout, inplace=False)
+        elif net_name.startswith('ConvNeXt'):
+            prefix = cls.construct_aux_module(net_name)
+        else:
+            prefix = nn.Identity()
+
+        fused_classifier = FusedMultiClassifier(prefix=prefix, in_features=in_features, num_outputs_for_label=num_outputs_for_label)
+        return fused_classifier
+
     @classmethod
     def get_classifier_in_features(cls, net_name: str) -> int:
         """
         Return in_feature of network indicating by net_name.
-        This class is used in class MultiNetFusion() only.
+        This class is used in class MultiNetFusion() and construct_fused_classifier().
 
         Args:
             net_name (str): net_name
 
         Returns:
             int : in_feature
-
-        Required:
-        classifier.in_feature
-        classifier.[1].in_features
-        classifier.[2].in_features
-        classifier.head.in_features
         """
         if net_name == 'MLP':
             in_features = cls.mlp_config['hidden_channels'][-1]
-
-        elif net_name.startswith('ResNet') or net_name.startswith('DenseNet'):
-            base_classifier = cls.get_classifier(net_name)
-            in_features = base_classifier.in_features
-
-        elif net_name.startswith('EfficientNet'):
-            base_classifier = cls.get_classifier(net_name)
-            in_features = base_classifier[1].in_features
-
-        elif net_name.startswith('ConvNeXt'):
-            base_classifier = cls.get_classifier(net_name)
-            in_features = base_classifier[2].in_features
-
-        elif net_name.startswith('ViT'):
-            base_classifier = cls.get_classifier(net_name)
-            in_features = base_classifier.head.in_features
-
         else:
-            raise ValueError(f"No specified net: {net_name}.")
+            in_features = cls.get_classifier_config(net_name)['in_features']
         return in_features
 
     @classmethod
@@ -364,9 +459,8 @@ class BaseNet:
         """
         aux_module = cls.DUMMY
         if net_name.startswith('ConvNeXt'):
-            base_classifier = cls.get_classifier(net_name)
-            layer_norm = base_classifier[0]
-            flatten = base_classifier[1]
+            layer_norm = cls.construct_layer_norm(net_name)
+            flatten = nn.Flatten(1)
             aux_module = nn.Sequential(
                                 layer_norm,
                                 flatten
@@ -421,6 +515,10 @@ class MultiMixin:
         Returns:
             Dict[str, float]: output of classifier of each label
         """
+        if isinstance(self.multi_classifier, FusedMultiClassifier):
+            output = self.multi_classifier.split(self.multi_classifier(out_features))
+            return output
+
         output = dict()
         for label_name, classifier in self.multi_classifier.items():
             output[label_name] = classifier(out_features)
@@ -445,7 +543,8 @@ class MultiNet(MultiWidget):
                 mlp_num_inputs: int = None,
                 in_channel: int = None,
                 vit_image_size: int = None,
-                pretrained: bool = None
+                pretrained: bool = None,
+                fused_head: bool = False
                 ) -> None:
         """
         Args:
@@ -455,6 +554,7 @@ class MultiNet(MultiWidget):
             in_channel (int): number of image channel, ie gray scale(=1) or color image(=3).
             vit_image_size (int): image size to be input to ViT.
             pretrained (bool): True when use pretrained CNN or ViT, otherwise False.
+            fused_head (bool): True when outputs of all labels are computed by a single nn.Linear.
         """
         super().__init__()
 
@@ -464,6 +564,7 @@ class MultiNet(MultiWidget):
         self.in_channel = in_channel
         self.vit_image_size = vit_image_size
         self.pretrained = pretrained
+        self.fused_head = fused_head
 
         # self.extractor_net = MLP or CVmodel
         self.extractor_net = self.construct_extractor(
@@ -473,7 +574,10 @@ class MultiNet(MultiWidget):
                                                     vit_image_size=self.vit_image_size,
                                                     pretrained=self.pretrained
                                                     )
-        self.multi_classifier = self.construct_multi_classifier(net_name=self.net_name, num_outputs_for_label=self.num_outputs_for_label)
+        if self.fused_head:
+            self.multi_classifier = self.construct_fused_classifier(net_name=self.net_name, num_outputs_for_label=self.num_outputs_for_label)
+        else:
+            self.multi_classifier = self.construct_multi_classifier(net_name=self.net_name, num_outputs_for_label=self.num_outputs_for_label)
 
     def forward(self, x: torch.Tensor) -> Dict[str, torch.Tensor]:
         """
@@ -501,7 +605,8 @@ class MultiNetFusion(MultiWidget):
                 mlp_num_inputs: int = None,
                 in_channel: int = None,
                 vit_image_size: int = None,
-                pretrained: bool = None
+                pretrained: bool = None,
+                fused_head: bool = False
                 ) -> None:
         """
         Args:
@@ -511,6 +616,7 @@ class MultiNetFusion(MultiWidget):
             in_channel (int): number of image channel, ie gray scale(=1) or color image(=3).
             vit_image_size (int): image size to be input to ViT.
             pretrained (bool): True when use pretrained CNN or ViT, otherwise False.
+            fused_head (bool): True when outputs of all labels are computed by a single nn.Linear.
         """
         assert (net_name != 'MLP'), 'net_name should not be MLP.'
 
@@ -522,6 +628,7 @@ class MultiNetFusion(MultiWidget):
         self.in_channel = in_channel
         self.vit_image_size = vit_image_size
         self.pretrained = pretrained
+        self.fused_head = fused_head
 
         # Extractor of MLP and Net
         self.extractor_mlp = self.construct_extractor(net_name='MLP', mlp_num_inputs=self.mlp_num_inputs)
@@ -540,7 +647,10 @@ class MultiNetFusion(MultiWidget):
         self.inter_mlp = self.MLPNet(mlp_num_inputs=self.inter_mlp_in_feature, inplace=False)
 
         # Multi classifier
-        self.multi_classifier = self.construct_multi_classifier(net_name='MLP', num_outputs_for_label=num_outputs_for_label)
+        if self.fused_head:
+            self.multi_classifier = self.construct_fused_classifier(net_name='MLP', num_outputs_for_label=num_outputs_for_label)
+        else:
+            self.multi_classifier = self.construct_multi_classifier(net_name='MLP', num_outputs_for_label=num_outputs_for_label)
 
     def forward(self, x_mlp: torch.Tensor, x_net: torch.Tensor) -> Dict[str, torch.Tensor]:
         """
@@ -570,7 +680,8 @@ def create_net(
             mlp_num_inputs: int = None,
             in_channel: int = None,
             vit_image_size: int = None,
-            pretrained: bool = None
+            pretrained: bool = None,
+            fused_head: bool = False
             ) -> nn.Module:
     """
     Create network.
@@ -583,6 +694,7 @@ def create_net(
         in_channel (int): number of image channel, ie gray scale(=1) or color image(=3).
         vit_image_size (int): image size to be input to ViT.
         pretrained (bool): True when use pretrained CNN or ViT, otherwise False.
+        fused_head (bool): True when outputs of all labels are computed by a single nn.Linear.
 
     Returns:
         nn.Module: network
@@ -598,7 +710,8 @@ def create_net(
                             mlp_num_inputs=mlp_num_inputs,
                             in_channel=in_channel,
                             vit_image_size=vit_image_size,
-                            pretrained=False   # No need of pretrained for MLP
+                            pretrained=False,   # No need of pretrained for MLP
+                            fused_head=fused_head
                             )
     elif _isCVModel:
         multi_net = MultiNet(
@@ -607,7 +720,8 @@ def create_net(
                             mlp_num_inputs=mlp_num_inputs,
                             in_channel=in_channel,
                             vit_image_size=vit_image_size,
-                            pretrained=pretrained
+                            pretrained=pretrained,
+                            fused_head=fused_head
                             )
     elif _isFusion:
         multi_net = MultiNetFusion(
@@ -616,7 +730,8 @@ def create_net(
                                 mlp_num_inputs=mlp_num_inputs,
                                 in_channel=in_channel,
                                 vit_image_size=vit_image_size,
-                                pretrained=pretrained
+                                pretrained=pretrained,
+                                fused_head=fused_head
                                 )
     else:
         raise ValueError(f"Invalid model type: mlp={mlp}, net={net}.")
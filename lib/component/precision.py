@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import torch
+import torch.optim as optim
+
+
+class MixedPrecision:
+    """
+    Class to run forward in mixed precision, and scale gradient when needed.
+    """
+    dtypes = {
+            'fp16': torch.float16,
+            'bf16': torch.bfloat16
+            }
+
+    def __init__(self, amp: str, device: torch.device) -> None:
+        """
+        Args:
+            amp (str): 'no', 'fp16', or 'bf16'
+            device (torch.device): device
+        """
+        assert (amp == 'no') or (amp in self.dtypes), f"Invalid mixed precision: {amp}."
+
+        self.enabled = (amp != 'no')
+        self.device_type = device.type
+        self.dtype = self.dtypes.get(amp)
+
+        if self.enabled and (self.device_type == 'cpu'):
+            assert (amp == 'bf16'), 'Only bf16 is available for mixed precision on CPU.'
+
+        # Gradient is scaled only for float16, whose range of exponent is narrow.
+        self.scaler = None
+        if amp == 'fp16':
+            # torch.cuda.amp.GradScaler is deprecated, and torch.amp.GradScaler is not in torch of Pipfile.
+            if hasattr(torch.amp, 'GradScaler'):
+                self.scaler = torch.amp.GradScaler(self.device_type)
+            else:
+                self.scaler = torch.cuda.amp.GradScaler()
+
+    def autocast(self) -> torch.autocast:
+        """
+        Return context in which forward runs in mixed precision.
+
+        Returns:
+            torch.autocast: context of autocast
+        """
+        return torch.autocast(device_type=self.device_type, dtype=self.dtype, enabled=self.enabled)
+
+    def backward(self, loss: torch.FloatTensor) -> None:
+        """
+        Backward with scaled loss.
+
+        Args:
+            loss (torch.FloatTensor): loss
+        """
+        if self.scaler is None:
+            loss.backward()
+            return
+
+        self.scaler.scale(loss).backward()
+
+    def step(self, optimizer: optim.Optimizer) -> None:
+        """
+        Update weight with unscaled gradient, and update scale.
+
+        Args:
+            optimizer (optim.Optimizer): optimizer
+        """
+        if self.scaler is None:
+            optimizer.step()
+            return
+
+        self.scaler.step(optimizer)
+        self.scaler.update()
+
+
+def set_mixed_precision(amp: str, device: torch.device) -> MixedPrecision:
+    """
+    Set mixed precision.
+
+    Args:
+        amp (str): 'no', 'fp16', or 'bf16'
+        device (torch.device): device
+
+    Returns:
+        MixedPrecision: instance of class MixedPrecision
+    """
+    return MixedPrecision(amp, device)
@@ -3,15 +3,20 @@
 
 import numpy as np
 import torch
+import torch.distributed as dist
 import torchvision.transforms as transforms
 from torch.utils.data.dataset import Dataset
 from torch.utils.data.dataloader import DataLoader
-from torch.utils.data.sampler import WeightedRandomSampler
+from torch.utils.data.sampler import Sampler, WeightedRandomSampler, RandomSampler, SequentialSampler, BatchSampler
+from torch.utils.data.distributed import DistributedSampler
 from PIL import Image
 from sklearn.preprocessing import MinMaxScaler
 import pickle
+import copy
+from collections import OrderedDict
+from .imageshard import ImageShard
 from .logger import BaseLogger
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Iterator
 import pandas as pd
 
 
@@ -71,31 +76,46 @@ class InputDataMixin:
 
     def _normalize_inputs(self, df_inputs: pd.DataFrame) -> torch.FloatTensor:
         """
-        Normalize inputs.
+        Normalize inputs of all rows at once.
 
         Args:
             df_inputs (pd.DataFrame): DataFrame of inputs
 
         Returns:
-            torch.FloatTensor: normalized inputs
+            torch.FloatTensor: normalized inputs, whose shape is (number of rows, number of inputs)
 
         Note:
-        After iloc[[idx], index_input_list], pd.DataFrame is obtained.
-        DataFrame fits the input type of self.scaler.transform.
-        However, after normalizing, the shape of inputs_value is (1, N), where N is the number of input values.
-        Since the shape (1, N) is not acceptable when forwarding, convert (1, N) -> (N,) is needed.
-        """
-        inputs_value = self.scaler.transform(df_inputs).reshape(-1)  #    np.float64
-        inputs_value = np.array(inputs_value, dtype=np.float32)      # -> np.float32
-        inputs_value = torch.from_numpy(inputs_value).clone()        # -> torch.float32
-        return inputs_value
+        self.scaler.transform is applied to the whole split as a single matrix operation,
+        and the result is cast to float32 only once.
+        """
+        inputs_values = self.scaler.transform(df_inputs)                             #    np.float64
+        inputs_values = np.ascontiguousarray(inputs_values, dtype=np.float32)        # -> np.float32
+        inputs_values = torch.from_numpy(inputs_values)                              # -> torch.float32
+        return inputs_values
 
-    def _load_input_value_if_mlp(self, idx: int) -> Union[torch.FloatTensor, str]:
+    def _make_input_values_if_mlp(self, df_split: pd.DataFrame) -> Union[torch.FloatTensor, None]:
         """
-        Load input values after converting them into tensor if MLP is used.
+        Make normalized input values of split if MLP is used.
 
         Args:
-            idx (int): index
+            df_split (pd.DataFrame): DataFrame of split
+
+        Returns:
+            Union[torch.FloatTensor, None]: normalized input values, or None
+        """
+        if self.params.mlp is None:
+            return None
+
+        input_values = self._normalize_inputs(df_split[self.input_list])
+        return input_values
+
+    def _load_input_value_if_mlp(self, idx: Union[int, np.ndarray]) -> Union[torch.FloatTensor, str]:
+        """
+        Load input values if MLP is used.
+        When indices are passed, input values of them are gathered as a batch by slicing.
+
+        Args:
+            idx (Union[int, np.ndarray]): index, or indices
 
         Returns:
             Union[torch.Tensor[float], str]: tensor of input values, or empty string
@@ -105,16 +125,75 @@ class InputDataMixin:
         if self.params.mlp is None:
             return inputs_value
 
-        index_input_list = [self.col_index_dict[input] for input in self.input_list]
-        _df_inputs = self.df_split.iloc[[idx], index_input_list]
-        inputs_value = self._normalize_inputs( _df_inputs)
+        inputs_value = self.input_values[idx]
         return inputs_value
 
 
+class ImageCache:
+    """
+    Class to cache decoded images with LRU eviction under memory budget.
+    Images are cached after converted to channel and before augmentation,
+    so random augmentation is still applied every epoch.
+    """
+    def __init__(self, max_bytes: int) -> None:
+        """
+        Args:
+            max_bytes (int): memory budget in bytes
+        """
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.images = OrderedDict()  # key is path to image, value is np.ndarray of np.uint8
+
+    def get(self, key: str) -> Union[np.ndarray, None]:
+        """
+        Return cached image, and mark it as the most recently used.
+
+        Args:
+            key (str): path to image
+
+        Returns:
+            Union[np.ndarray, None]: image, or None if not cached
+        """
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key: str, image: np.ndarray) -> None:
+        """
+        Cache image, and evict the least recently used ones if over memory budget.
+
+        Args:
+            key (str): path to image
+            image (np.ndarray): image
+        """
+        if (key in self.images) or (image.nbytes > self.max_bytes):
+            return
+
+        self.images[key] = image
+        self.num_bytes += image.nbytes
+        while self.num_bytes > self.max_bytes:
+            _, _evicted = self.images.popitem(last=False)
+            self.num_bytes -= _evicted.nbytes
+
+
 class ImageMixin:
     """
     Class to normalize and transform image.
     """
+    def _make_image_cache(self) -> Union[ImageCache, None]:
+        """
+        Make cache of decoded images if memory budget is specified.
+
+        Returns:
+            Union[ImageCache, None]: cache, or None
+        """
+        if self.params.image_cache_mb <= 0:
+            return None
+
+        image_cache = ImageCache(self.params.image_cache_mb * (1024 ** 2))
+        return image_cache
+
     def _make_augmentations(self) -> List:
         """
         Define which augmentation is applied.
@@ -123,7 +202,10 @@ class ImageMixin:
         When test, no need of augmentation.
         """
         _augmentation = []
-        if (self.params.isTrain) and (self.split == 'train'):
+        if self.params.gpu_augmentation == 'yes':
+            # Augmentation is applied on device in model.
+            pass
+        elif (self.params.isTrain) and (self.split == 'train'):
             if self.params.augmentation == 'xrayaug':
                 _augmentation = PrivateAugment.xray_augs_list
             elif self.params.augmentation == 'trivialaugwide':
@@ -145,6 +227,12 @@ class ImageMixin:
             list of transforms: image normalization
         """
         _transforms = []
+        if self.params.gpu_augmentation == 'yes':
+            # Image is passed as torch.uint8, and normalized on device in model.
+            _transforms.append(transforms.PILToTensor())
+            _transforms = transforms.Compose(_transforms)
+            return _transforms
+
         _transforms.append(transforms.ToTensor())
 
         if self.params.normalize_image == 'yes':
@@ -158,6 +246,20 @@ class ImageMixin:
         _transforms = transforms.Compose(_transforms)
         return _transforms
 
+    def _make_image_shard(self) -> Union[ImageShard, None]:
+        """
+        Make shard of packed images if specified.
+
+        Returns:
+            Union[ImageShard, None]: shard, or None
+        """
+        if self.params.image_shard is None:
+            return None
+
+        image_shard = ImageShard(self.params.image_shard)
+        assert (image_shard.in_channel == self.params.in_channel), f"Channel of images in {self.params.image_shard} is not {self.params.in_channel}."
+        return image_shard
+
     def _open_image_in_channel(self, imgpath: str, in_channel: int) -> Image:
         """
         Open image in channel.
@@ -177,6 +279,27 @@ class ImageMixin:
             image = Image.open(imgpath).convert('RGB')  # eg. np.array(image).shape = (64, 64, 3)
             return image
 
+    def _read_image(self, imgpath: str) -> Image:
+        """
+        Read image through cache if cache is used.
+
+        Args:
+            imgpath (str): path to image
+
+        Returns:
+            Image: PIL image
+        """
+        if self.image_cache is None:
+            image = self._open_image_in_channel(imgpath, self.params.in_channel)
+            return image
+
+        _image = self.image_cache.get(imgpath)
+        if _image is None:
+            _image = np.asarray(self._open_image_in_channel(imgpath, self.params.in_channel))
+            self.image_cache.put(imgpath, _image)
+        image = Image.fromarray(_image)
+        return image
+
     def _load_image_if_cnn(self, idx: int) -> Union[torch.Tensor, str]:
         """
         Load image and convert it to tensor if any of CNN or ViT is used.
@@ -192,8 +315,11 @@ class ImageMixin:
         if self.params.net is None:
             return image
 
-        imgpath = self.df_split.iat[idx, self.col_index_dict['imgpath']]
-        image = self._open_image_in_channel(imgpath, self.params.in_channel)
+        if self.image_shard is not None:
+            # Sliced from memory map without copy.
+            image = Image.fromarray(self.image_shard.get_image(self.shard_rows[idx]))
+        else:
+            image = self._read_image(self.imgpaths[idx])
         image = self.augmentation(image)
         image = self.transform(image)
         return image
@@ -203,6 +329,24 @@ class DeepSurvMixin:
     """
     Class to handle required data for deepsurv.
     """
+    def _make_period_values_if_deepsurv(self, df_split: pd.DataFrame) -> Union[torch.FloatTensor, None]:
+        """
+        Make periods of split if deepsurv.
+
+        Args:
+            df_split (pd.DataFrame): DataFrame of split
+
+        Returns:
+            Union[torch.FloatTensor, None]: periods, or None
+        """
+        if self.params.task != 'deepsurv':
+            return None
+
+        assert (self.params.task == 'deepsurv') and (len(self.label_list) == 1), 'Deepsurv cannot work in multi-label.'
+        period_values = df_split[self.period_name].to_numpy(dtype=np.float32)  #    int64 -> np.float32
+        period_values = torch.from_numpy(period_values)                         # -> torch.float32
+        return period_values
+
     def _load_periods_if_deepsurv(self, idx: int) -> Union[torch.FloatTensor, str]:
         """
         Return period if deepsurv.
@@ -218,10 +362,7 @@ class DeepSurvMixin:
         if self.params.task != 'deepsurv':
             return periods
 
-        assert (self.params.task == 'deepsurv') and (len(self.label_list) == 1), 'Deepsurv cannot work in multi-label.'
-        periods = self.df_split.iat[idx, self.col_index_dict[self.period_name]]  #    int64
-        periods = np.array(periods, dtype=np.float32)                            # -> np.float32
-        periods = torch.from_numpy(periods).clone()                              # -> torch.float32
+        periods = self.period_values[idx]
         return periods
 
 
@@ -256,8 +397,7 @@ class LoadDataSet(Dataset, DataSetWidget):
         if self.params.task == 'deepsurv':
             self.period_name = self.params.period_name
 
-        self.df_split = self.df_source[self.df_source['split'] == self.split]
-        self.col_index_dict = {col_name: self.df_split.columns.get_loc(col_name) for col_name in self.df_split.columns}
+        _df_split = self.df_source[self.df_source['split'] == self.split]
 
         # For input data
         if self.params.mlp is not None:
@@ -268,41 +408,87 @@ class LoadDataSet(Dataset, DataSetWidget):
                 # load scaler used at training.
                 self.scaler = self.load_scaler(self.params.scaler_path)
 
+        # Columns of split are held as arrays not to look up DataFrame every item.
+        self.uniqIDs = _df_split['uniqID'].to_numpy()
+        self.groups = _df_split['group'].to_numpy()
+        self.imgpaths = _df_split['imgpath'].to_numpy()
+        self.splits = _df_split['split'].to_numpy()
+        self.input_values = self._make_input_values_if_mlp(_df_split)
+        self.label_values = self._make_label_values(_df_split)
+        self.period_values = self._make_period_values_if_deepsurv(_df_split)
+
         # For image
         if self.params.net is not None:
             self.augmentation = self._make_augmentations()
             self.transform = self._make_transforms()
+            self.image_cache = self._make_image_cache()
+            self.image_shard = self._make_image_shard()
+            if self.image_shard is not None:
+                self.shard_rows = np.array([self.image_shard.get_row(uniqID) for uniqID in self.uniqIDs])
 
     def __len__(self) -> int:
         """
-        Return length of DataFrame.
+        Return length of split.
 
         Returns:
-            int: length of DataFrame
+            int: length of split
         """
-        return len(self.df_split)
+        return len(self.uniqIDs)
 
-    def _load_label(self, idx: int) -> Dict[str, Union[int, float]]:
+    def __getstate__(self) -> Dict:
         """
-        Return labels.
+        Return state to be pickled when dataset is sent to worker processes of DataLoader.
+
+        Returns:
+            Dict: state of dataset
+
+        Note:
+        df_source is needed only to fit scaler when constructing dataset.
+        Drop it not to copy the whole csv into every worker.
+        """
+        state = self.__dict__.copy()
+        state['df_source'] = None
+        _params = copy.copy(self.params)
+        _params.df_source = None
+        state['params'] = _params
+        return state
+
+    def _make_label_values(self, df_split: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Make arrays of labels.
         If no column of label when csv of external dataset is used,
         empty dictionary is returned.
 
         Args:
-            idx (int): index
+            df_split (pd.DataFrame): DataFrame of split
 
         Returns:
-            Dict[str, Union[int, float]]: dictionary of label name and its value
+            Dict[str, np.ndarray]: dictionary of label name and its values
         """
         # For checking if columns of labels exist when used csv for external dataset.
-        label_list_in_split = list(self.df_split.columns[self.df_split.columns.str.startswith('label')])
-        label_dict = dict()
+        label_list_in_split = list(df_split.columns[df_split.columns.str.startswith('label')])
+        label_values = dict()
         if label_list_in_split != []:
             for label_name in self.label_list:
-                label_dict[label_name] = self.df_split.iat[idx, self.col_index_dict[label_name]]
+                label_values[label_name] = df_split[label_name].to_numpy()
         else:
             # no label
             pass
+        return label_values
+
+    def _load_label(self, idx: int) -> Dict[str, Union[int, float]]:
+        """
+        Return labels.
+        If no column of label when csv of external dataset is used,
+        empty dictionary is returned.
+
+        Args:
+            idx (int): index
+
+        Returns:
+            Dict[str, Union[int, float]]: dictionary of label name and its value
+        """
+        label_dict = {label_name: values[idx] for label_name, values in self.label_values.items()}
         return label_dict
 
     def __getitem__(self, idx: int) -> Dict:
@@ -315,10 +501,10 @@ class LoadDataSet(Dataset, DataSetWidget):
         Returns:
             Dict: dictionary of data to be passed model
         """
-        uniqID = self.df_split.iat[idx, self.col_index_dict['uniqID']]
-        group = self.df_split.iat[idx, self.col_index_dict['group']]
-        imgpath = self.df_split.iat[idx, self.col_index_dict['imgpath']]
-        split = self.df_split.iat[idx, self.col_index_dict['split']]
+        uniqID = self.uniqIDs[idx]
+        group = self.groups[idx]
+        imgpath = self.imgpaths[idx]
+        split = self.splits[idx]
         inputs_value = self._load_input_value_if_mlp(idx)
         image = self._load_image_if_cnn(idx)
         label_dict = self._load_label(idx)
@@ -337,6 +523,56 @@ class LoadDataSet(Dataset, DataSetWidget):
         return _data
 
 
+class LoadBatchDataSet(LoadDataSet):
+    """
+    Dataset for split which returns a whole batch at once.
+    This is used when only MLP, ie. no image, is used.
+    """
+    def __getitem__(self, idx: Union[int, List[int]]) -> Dict:
+        """
+        Return data rows specified by indices as a batch already stacked.
+
+        Args:
+            idx (Union[int, List[int]]): indices of batch, or index
+
+        Returns:
+            Dict: dictionary of batch to be passed model
+
+        Note:
+        When an integer index is passed, a single data row is returned as LoadDataSet does.
+        """
+        if isinstance(idx, (int, np.integer)):
+            return super().__getitem__(idx)
+
+        indices = np.asarray(idx)
+        periods = self._load_periods_if_deepsurv(indices)
+        _data = {
+                'uniqID': self.uniqIDs[indices].tolist(),
+                'group': self.groups[indices].tolist(),
+                'imgpath': self.imgpaths[indices].tolist(),
+                'split': self.splits[indices].tolist(),
+                'inputs': self._load_input_value_if_mlp(indices),
+                'image': '',
+                'labels': {label_name: torch.from_numpy(values[indices]) for label_name, values in self.label_values.items()},
+                'periods': periods
+                }
+        return _data
+
+
+def _pass_batch(batch: Dict) -> Dict:
+    """
+    Return batch as it is.
+    This is used as collate_fn for LoadBatchDataSet, which returns a batch already stacked.
+
+    Args:
+        batch (Dict): batch
+
+    Returns:
+        Dict: batch
+    """
+    return batch
+
+
 def _make_sampler(split_data: LoadDataSet) -> WeightedRandomSampler:
     """
     Make sampler.
@@ -347,17 +583,57 @@ def _make_sampler(split_data: LoadDataSet) -> WeightedRandomSampler:
     Returns:
         WeightedRandomSampler: sampler
     """
-    _target = []
-    for _, data in enumerate(split_data):
-        _target.append(list(data['labels'].values())[0])
+    # Read label column directly without loading data.
+    _target = list(split_data.label_values.values())[0]
 
-    class_sample_count = np.array([len(np.where(_target == t)[0]) for t in np.unique(_target)])
+    _, _class_index = np.unique(_target, return_inverse=True)  # index of class for each sample
+    class_sample_count = np.bincount(_class_index)
     weight = 1. / class_sample_count
-    samples_weight = np.array([weight[t] for t in _target])
+    samples_weight = weight[_class_index]
     sampler = WeightedRandomSampler(samples_weight, len(samples_weight))
     return sampler
 
 
+class DistributedEvalSampler(Sampler):
+    """
+    Sampler to divide split into processes without padding.
+    DistributedSampler repeats samples so that all processes have the same number of samples,
+    which makes loss summed over processes differ from that of the split.
+    This is used for val, where processes need not have the same number of batches since no gradient is synchronized.
+    """
+    def __init__(self, split_data: Dataset) -> None:
+        """
+        Args:
+            split_data (Dataset): dataset
+        """
+        self.num_samples = len(split_data)
+        self.rank = dist.get_rank()
+        self.world_size = dist.get_world_size()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.rank, self.num_samples, self.world_size))
+
+    def __len__(self) -> int:
+        return len(range(self.rank, self.num_samples, self.world_size))
+
+
+def set_sampler_epoch(split_loader: DataLoader, epoch: int) -> None:
+    """
+    Set epoch to DistributedSampler so that data are shuffled differently every epoch.
+    Nothing is done when not distributed.
+
+    Args:
+        split_loader (DataLoader): data loader
+        epoch (int): epoch number
+    """
+    sampler = split_loader.sampler
+    if isinstance(sampler, BatchSampler):
+        sampler = sampler.sampler
+
+    if isinstance(sampler, DistributedSampler):
+        sampler.set_epoch(epoch)
+
+
 def create_dataloader(
                     params,
                     split: str = None
@@ -372,7 +648,12 @@ def create_dataloader(
     Returns:
         DataLoader: data loader
     """
-    split_data = LoadDataSet(params, split)
+    # When only MLP, a whole batch can be gathered from dataset at once.
+    isBatchDataSet = (params.net is None)
+    if isBatchDataSet:
+        split_data = LoadBatchDataSet(params, split)
+    else:
+        split_data = LoadDataSet(params, split)
 
     if params.isTrain:
         batch_size = params.batch_size
@@ -390,11 +671,50 @@ def create_dataloader(
         # When params.sampler == 'no'
         sampler = None
 
+    if params.distributed == 'yes':
+        # Split is divided into processes. The number of processes and rank are taken from process group.
+        assert (params.sampler == 'no'), 'Cannot make sampler when distributed.'
+        if split == 'train':
+            sampler = DistributedSampler(split_data, shuffle=shuffle)
+        else:
+            # Each sample is evaluated only once, so that loss is divided by the size of split correctly.
+            sampler = DistributedEvalSampler(split_data)
+        shuffle = False
+
+    if (params.image_cache_mb > 0) and (params.num_workers > 0) and (params.persistent_workers == 'no'):
+        logger.warning('Cache of images is discarded every epoch since workers are not persistent. Set persistent_workers yes.')
+
+    # Options below are valid only when loading with worker processes.
+    _worker_options = dict()
+    if params.num_workers > 0:
+        _worker_options = {
+                            'persistent_workers': (params.persistent_workers == 'yes'),
+                            'prefetch_factor': params.prefetch_factor
+                        }
+
+    if isBatchDataSet:
+        # Indices of batch are passed to dataset, and default collate is skipped.
+        if sampler is None:
+            sampler = RandomSampler(split_data) if shuffle else SequentialSampler(split_data)
+        batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=False)
+        split_loader = DataLoader(
+                                dataset=split_data,
+                                batch_size=None,
+                                sampler=batch_sampler,
+                                collate_fn=_pass_batch,
+                                num_workers=params.num_workers,
+                                pin_memory=(params.pin_memory == 'yes'),
+                                **_worker_options
+                                )
+        return split_loader
+
     split_loader = DataLoader(
                             dataset=split_data,
                             batch_size=batch_size,
                             shuffle=shuffle,
-                            num_workers=0,
-                            sampler=sampler
+                            num_workers=params.num_workers,
+                            sampler=sampler,
+                            pin_memory=(params.pin_memory == 'yes'),
+                            **_worker_options
                             )
     return split_loader
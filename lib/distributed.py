@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import torch
+import torch.distributed as dist
+from typing import List
+
+
+def get_world_size(gpu_ids: List[int], world_size: int) -> int:
+    """
+    Return the number of processes.
+    One process is launched for each GPU, or world_size processes are launched on CPU.
+
+    Args:
+        gpu_ids (List[int]): GPU ids
+        world_size (int): the number of processes when CPU
+
+    Returns:
+        int: the number of processes
+    """
+    if gpu_ids != []:
+        return len(gpu_ids)
+    else:
+        return world_size
+
+
+def set_master_address() -> None:
+    """
+    Set address and port of the main process, which processes connect to, unless set by MASTER_ADDR and MASTER_PORT.
+    A free port is found, so that several trainings can run on one host.
+    This should be called before processes are launched, since they inherit environment variables.
+    """
+    os.environ.setdefault('MASTER_ADDR', '127.0.0.1')
+    if 'MASTER_PORT' not in os.environ:
+        with socket.socket() as sock:
+            sock.bind((os.environ['MASTER_ADDR'], 0))
+            os.environ['MASTER_PORT'] = str(sock.getsockname()[1])
+
+
+def setup_process_group(rank: int, world_size: int, gpu_ids: List[int]) -> torch.device:
+    """
+    Initialize process group, and return device of the process.
+    nccl is used as backend when GPU, otherwise gloo.
+    MASTER_ADDR and MASTER_PORT should be set by set_master_address() in advance.
+
+    Args:
+        rank (int): rank of process
+        world_size (int): the number of processes
+        gpu_ids (List[int]): GPU ids
+
+    Returns:
+        torch.device: device of process
+    """
+    if gpu_ids != []:
+        device = torch.device(f"cuda:{gpu_ids[rank]}")
+        torch.cuda.set_device(device)
+        dist.init_process_group(backend='nccl', rank=rank, world_size=world_size)
+    else:
+        device = torch.device('cpu')
+        dist.init_process_group(backend='gloo', rank=rank, world_size=world_size)
+    return device
+
+
+def cleanup_process_group() -> None:
+    """
+    Destroy process group.
+    """
+    if is_distributed():
+        dist.destroy_process_group()
+
+
+def is_distributed() -> bool:
+    """
+    Check if process group is initialized.
+
+    Returns:
+        bool: True if distributed
+    """
+    return dist.is_available() and dist.is_initialized()
+
+
+def is_main_process() -> bool:
+    """
+    Check if rank is 0, or not distributed.
+    Only the main process saves weight, learning curve, etc.
+
+    Returns:
+        bool: True if main process
+    """
+    return (not is_distributed()) or (dist.get_rank() == 0)
+
+
+def all_reduce_sum(values: List[float]) -> List[float]:
+    """
+    Sum values over all processes.
+
+    Args:
+        values (List[float]): values of process
+
+    Returns:
+        List[float]: values summed over all processes
+    """
+    # nccl can handle only tensors on GPU.
+    if dist.get_backend() == 'nccl':
+        device = torch.device('cuda', torch.cuda.current_device())
+    else:
+        device = torch.device('cpu')
+    _values = torch.tensor(values, dtype=torch.float64, device=device)
+    dist.all_reduce(_values, op=dist.ReduceOp.SUM)
+    return _values.tolist()
@@ -4,12 +4,13 @@
 from pathlib import Path
 import copy
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import torch.nn as nn
-from .component import create_net
+from .component import create_net, set_image_transform
 from .logger import BaseLogger
 from lib import ParamSet
-from typing import List, Dict, Tuple, Union
+from typing import List, Dict, Tuple, Union, Iterator
 
 # Alias of typing
 # eg. {'labels': {'label_A: torch.Tensor([0, 1, ...]), ...}}
@@ -40,10 +41,21 @@ class BaseModel(ABC):
                                 mlp_num_inputs=self.params.mlp_num_inputs,
                                 in_channel=self.params.in_channel,
                                 vit_image_size=self.params.vit_image_size,
-                                pretrained=self.params.pretrained
+                                pretrained=self.params.pretrained,
+                                fused_head=(self.params.fused_head == 'yes')
                                 )
         self.network.to(self.device)
 
+        # Augmentation and normalization of image on device
+        self.image_transform = None
+        if (self.params.net is not None) and (self.params.gpu_augmentation == 'yes'):
+            self.image_transform = set_image_transform(
+                                                    augmentation=self.params.augmentation,
+                                                    normalize_image=self.params.normalize_image,
+                                                    in_channel=self.params.in_channel,
+                                                    device=self.device
+                                                    )
+
         # variables to keep temporary best_weight and best_epoch
         self.acting_best_weight = None
         self.acting_best_epoch = None
@@ -60,6 +72,23 @@ class BaseModel(ABC):
         """
         self.network.eval()
 
+    def _set_image(self, image: torch.Tensor) -> torch.FloatTensor:
+        """
+        Pass image to device.
+        When image is augmented and normalized on device, they are done here.
+        Augmentation is applied only in training mode.
+
+        Args:
+            image (torch.Tensor): batch of image
+
+        Returns:
+            torch.FloatTensor: image on device
+        """
+        image = image.to(self.device)
+        if self.image_transform is not None:
+            image = self.image_transform(image, isTrain=self.network.training)
+        return image
+
     @abstractmethod
     def set_data(
                 self,
@@ -112,16 +141,18 @@ class BaseModel(ABC):
             save_name = 'weight_epoch-' + str(self.acting_best_epoch).zfill(3) + '.pt'
             torch.save(self.acting_best_weight, save_path)
 
-    def load_weight(self, weight_path: Path) -> None:
+    def set_weight(self, weight: Dict[str, torch.Tensor]) -> None:
         """
-        Load wight from weight_path.
+        Copy weight into the current network in place.
+        The network is not rebuilt, and stays on device even if DataParallel is used.
 
         Args:
-            weight_path (Path): path to weight
+            weight (Dict[str, torch.Tensor]): state_dict of network
         """
-        logger.info(f"Load weight: {weight_path}.\n")
-        weight = torch.load(weight_path)
-        self.network.load_state_dict(weight)
+        if hasattr(self.network, 'module'):
+            self.network.module.load_state_dict(weight)
+        else:
+            self.network.load_state_dict(weight)
 
 
 class ModelMixin:
@@ -136,21 +167,16 @@ class ModelMixin:
             assert torch.cuda.is_available(), 'No available GPU on this machine.'
             self.network = nn.DataParallel(self.network, device_ids=gpu_ids)
 
-    def init_network(self) -> None:
+    def to_distributed(self) -> None:
         """
-        Initialize network.
-        This method is used at test to reset the current weight by redefining network.
+        Make model compute with DistributedDataParallel.
+        Process group should be initialized in advance, and self.device should be the device of the process.
         """
-        self.network = create_net(
-                                mlp=self.params.mlp,
-                                net=self.params.net,
-                                num_outputs_for_label=self.params.num_outputs_for_label,
-                                mlp_num_inputs=self.params.mlp_num_inputs,
-                                in_channel=self.params.in_channel,
-                                vit_image_size=self.params.vit_image_size,
-                                pretrained=self.params.pretrained
-                                )
-        self.network.to(self.device)
+        if self.device.type == 'cuda':
+            self.network = nn.parallel.DistributedDataParallel(self.network, device_ids=[self.device.index])
+        else:
+            self.network = nn.parallel.DistributedDataParallel(self.network)
+
 
 class ModelWidget(BaseModel, ModelMixin):
     """
@@ -255,7 +281,7 @@ class CVModel(ModelWidget):
         eg.
         ([image], [labels]), or ([image], [labels, periods, network]) when deepsurv
         """
-        in_data = {'image': data['image'].to(self.device)}
+        in_data = {'image': self._set_image(data['image'])}
         labels = {'labels': {label_name: label.to(self.device) for label_name, label in data['labels'].items()}}
 
         if not any(data['periods']):
@@ -319,7 +345,7 @@ class FusionModel(ModelWidget):
         """
         in_data = {
                 'inputs': data['inputs'].to(self.device),
-                'image': data['image'].to(self.device)
+                'image': self._set_image(data['image'])
                 }
         labels = {'labels': {label_name: label.to(self.device) for label_name, label in data['labels'].items()}}
 
@@ -349,6 +375,36 @@ class FusionModel(ModelWidget):
         return output
 
 
+def iterate_weights(weight_paths: List[str], prefetch: bool = False) -> Iterator[Tuple[str, Dict[str, torch.Tensor]]]:
+    """
+    Load weights in order of weight_paths.
+    When prefetch, the next weight is read from disk on a background thread while the current one is used.
+
+    Args:
+        weight_paths (List[str]): paths to weight
+        prefetch (bool): True if the next weight is read in advance. Defaults to False.
+
+    Yields:
+        Iterator[Tuple[str, Dict[str, torch.Tensor]]]: path to weight and its state_dict on CPU
+    """
+    def _load(weight_path: str) -> Dict[str, torch.Tensor]:
+        return torch.load(weight_path, map_location=torch.device('cpu'))
+
+    if not prefetch:
+        for weight_path in weight_paths:
+            logger.info(f"Load weight: {weight_path}.\n")
+            yield weight_path, _load(weight_path)
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        _next = executor.submit(_load, weight_paths[0]) if weight_paths != [] else None
+        for i, weight_path in enumerate(weight_paths):
+            weight = _next.result()
+            _next = executor.submit(_load, weight_paths[i + 1]) if (i + 1) < len(weight_paths) else None
+            logger.info(f"Load weight: {weight_path}.\n")
+            yield weight_path, weight
+
+
 def create_model(params: ParamSet) -> nn.Module:
     """
     Construct model.
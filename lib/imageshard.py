@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+from PIL import Image
+from .logger import BaseLogger
+from typing import Dict, Union
+
+
+logger = BaseLogger.get_logger(__name__)
+
+
+class ImageShard:
+    """
+    Class to read images packed into a single memory-mapped array.
+
+    Directory of shard contains the followings:
+        images.npy: array of np.uint8, whose shape is (N, H, W) when 1 channel, or (N, H, W, 3) when 3 channels.
+        index.json: in_channel, shape of image, and row of each uniqID in images.npy.
+    """
+    images_name = 'images.npy'
+    index_name = 'index.json'
+
+    def __init__(self, shard_dir: str) -> None:
+        """
+        Args:
+            shard_dir (str): path to directory of shard
+        """
+        self.shard_dir = shard_dir
+
+        with open(Path(self.shard_dir, self.index_name)) as f:
+            _index = json.load(f)
+
+        self.in_channel = _index['in_channel']
+        self.image_shape = tuple(_index['image_shape'])
+        self.rows = _index['rows']  # eg. {'0001': 0, '0002': 1, ...}
+
+        # Opened when first accessed, so that memory map is not pickled into workers of DataLoader.
+        self._images = None
+
+    @property
+    def images(self) -> np.memmap:
+        """
+        Return memory-mapped array of images.
+
+        Returns:
+            np.memmap: images
+        """
+        if self._images is None:
+            self._images = np.load(Path(self.shard_dir, self.images_name), mmap_mode='r')
+        return self._images
+
+    def __getstate__(self) -> Dict:
+        """
+        Return state to be pickled without memory map.
+
+        Returns:
+            Dict: state of shard
+        """
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    def get_row(self, uniqID: Union[str, int]) -> int:
+        """
+        Return row of uniqID in images.
+
+        Args:
+            uniqID (Union[str, int]): uniqID
+
+        Returns:
+            int: row
+        """
+        _uniqID = str(uniqID)
+        assert (_uniqID in self.rows), f"No image of uniqID in {self.shard_dir}: {_uniqID}."
+        return self.rows[_uniqID]
+
+    def get_image(self, row: int) -> np.ndarray:
+        """
+        Return image at row without copy.
+
+        Args:
+            row (int): row
+
+        Returns:
+            np.ndarray: image
+        """
+        return self.images[row]
+
+
+def pack_image_shard(csvpath: str, shard_dir: str, in_channel: int) -> None:
+    """
+    Pack images in imgpath of csv into a single memory-mapped array.
+
+    Args:
+        csvpath (str): path to csv
+        shard_dir (str): path to directory to save shard
+        in_channel (int): channel, or 1 or 3
+
+    Note:
+    All images should have the same size.
+    """
+    df_source = pd.read_csv(csvpath)
+    df_source = df_source[df_source['split'] != 'exclude']
+    assert df_source['uniqID'].is_unique, f"uniqID should be unique in {csvpath}."
+
+    mode = 'L' if in_channel == 1 else 'RGB'
+    uniqIDs = df_source['uniqID'].astype(str).tolist()
+    imgpaths = df_source['imgpath'].tolist()
+
+    # Size of images is defined by the first one.
+    _first = np.asarray(Image.open(imgpaths[0]).convert(mode))
+    image_shape = _first.shape
+
+    save_dir = Path(shard_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    images = np.lib.format.open_memmap(
+                                    Path(save_dir, ImageShard.images_name),
+                                    mode='w+',
+                                    dtype=np.uint8,
+                                    shape=(len(imgpaths), *image_shape)
+                                    )
+
+    for row, imgpath in enumerate(imgpaths):
+        image = np.asarray(Image.open(imgpath).convert(mode))
+        assert (image.shape == image_shape), f"Size of image should be {image_shape}, but {image.shape}: {imgpath}."
+        images[row] = image
+    images.flush()
+
+    _index = {
+            'in_channel': in_channel,
+            'image_shape': list(image_shape),
+            'rows': {uniqID: row for row, uniqID in enumerate(uniqIDs)}
+            }
+    with open(Path(save_dir, ImageShard.index_name), 'w') as f:
+        json.dump(_index, f)
+
+    logger.info(f"Packed {len(imgpaths)} images into {save_dir}.")
@@ -2,19 +2,59 @@
 # -*- coding: utf-8 -*-
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from sklearn import metrics
 from sklearn.preprocessing import label_binarize
 import matplotlib.pyplot as plt
 from matplotlib import colors as mcolors
+from .summary import set_summary_store
 from .logger import BaseLogger
-from typing import Dict, Union
+from typing import List, Dict, Tuple, Union, Callable, Iterator, Any
 
 
 logger = BaseLogger.get_logger(__name__)
 
 
+def read_likelihood(likelihood_path: Path, columns: Union[List[str], Callable[[str], bool]] = None) -> pd.DataFrame:
+    """
+    Read likelihood in csv, parquet, or feather depending on its extension.
+    parquet and feather are memory-mapped, and only the selected columns are read.
+
+    Args:
+        likelihood_path (Path): path to likelihood
+        columns (Union[List[str], Callable[[str], bool]], optional): columns to be read, or function to select them. Defaults to None, ie. all columns.
+
+    Returns:
+        pd.DataFrame: likelihood
+    """
+    _suffix = Path(likelihood_path).suffix
+    if _suffix == '.csv':
+        return pd.read_csv(likelihood_path, usecols=columns)
+
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if _suffix == '.parquet':
+        _column_names = pq.read_schema(likelihood_path).names
+    elif _suffix == '.feather':
+        with pa.memory_map(str(likelihood_path)) as source:
+            _column_names = pa.ipc.open_file(source).schema.names
+    else:
+        raise ValueError(f"Invalid format of likelihood: {likelihood_path}.")
+
+    if callable(columns):
+        columns = [column_name for column_name in _column_names if columns(column_name)]
+
+    if _suffix == '.parquet':
+        table = pq.read_table(likelihood_path, columns=columns, memory_map=True)
+    else:
+        table = feather.read_table(likelihood_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
 class MetricsData:
     """
     Class to store metrics as class variable.
@@ -29,9 +69,14 @@ class MetricsData:
         self.y_obs: np.ndarray
         self.y_pred: np.ndarray
         self.r2: float
+        self.rmse: float, only when streaming
 
     For DeepSurv
         self.c_index: float
+
+    For bootstrap
+        self.ci_lower: float
+        self.ci_upper: float
     """
     def __init__(self) -> None:
         pass
@@ -56,8 +101,9 @@ class LabelMetrics:
             split (str): split
             attr (str): attribute name as follows:
                         classification: 'fpr', 'tpr', or 'auc',
-                        regression:     'y_obs'(ground truth), 'y_pred'(prediction) or 'r2', or
-                        deepsurv:       'c_index'
+                        regression:     'y_obs'(ground truth), 'y_pred'(prediction), 'r2', or 'rmse',
+                        deepsurv:       'c_index', or
+                        bootstrap:      'ci_lower' or 'ci_upper'
             value (Union[np.ndarray,float]): value of attr
         """
         setattr(getattr(self, split), attr, value)
@@ -76,6 +122,53 @@ class LabelMetrics:
         return getattr(getattr(self, split), attr)
 
 
+class GroupLikelihood:
+    """
+    Class to hold columns of likelihood and rows of each split for group.
+    Rows are held as indices into columns shared by all groups, so that likelihood is not copied for each group.
+    """
+    def __init__(self, columns: Dict[str, np.ndarray], split_indices: Dict[str, np.ndarray]) -> None:
+        """
+        Args:
+            columns (Dict[str, np.ndarray]): columns of the whole likelihood
+            split_indices (Dict[str, np.ndarray]): split and indices of its rows in group
+        """
+        self.columns = columns
+        self.split_indices = split_indices
+
+    def get_values(self, split: str, column_name: str) -> np.ndarray:
+        """
+        Return values of column in split.
+
+        Args:
+            split (str): split
+            column_name (str): column name
+
+        Returns:
+            np.ndarray: values
+        """
+        _indices = self.split_indices.get(split, np.array([], dtype=np.int64))
+        return self.columns[column_name][_indices]
+
+    def compact(self) -> 'GroupLikelihood':
+        """
+        Return GroupLikelihood which holds only rows of group.
+        This is used to pass group to another process without the whole likelihood.
+
+        Returns:
+            GroupLikelihood: likelihood only for group
+        """
+        _indices = np.concatenate(list(self.split_indices.values()))
+        columns = {column_name: values[_indices] for column_name, values in self.columns.items()}
+
+        split_indices = dict()
+        _start = 0
+        for split, indices in self.split_indices.items():
+            split_indices[split] = np.arange(_start, _start + len(indices))
+            _start = _start + len(indices)
+        return GroupLikelihood(columns, split_indices)
+
+
 class ROCMixin:
     """
     Class for calculating ROC and AUC.
@@ -96,96 +189,308 @@ class ROCMixin:
         label_metrics.set_label_metrics(split, 'tpr', tpr)
         label_metrics.set_label_metrics(split, self.metrics_kind, metrics.auc(fpr, tpr))
 
-    def _cal_label_roc_binary(self, label_name: str, df_group: pd.DataFrame) -> LabelMetrics:
+    def _cal_label_roc_binary(self, label_name: str, group_likelihood: GroupLikelihood) -> LabelMetrics:
         """
         Calculate ROC for binary class.
 
         Args:
             label_name (str): label name
-            df_group (pd.DataFrame): likelihood for group
+            group_likelihood (GroupLikelihood): likelihood for group
 
         Returns:
             LabelMetrics: metrics of 'val' and 'test'
         """
-        required_columns = [column_name for column_name in df_group.columns if label_name in column_name] + ['split']
-        df_label = df_group[required_columns]
         POSITIVE = 1
         positive_pred_name = 'pred_' + label_name + '_' + str(POSITIVE)
 
         # ! When splits is 'test' only, ie when external dataset, error occurs.
         label_metrics = LabelMetrics()
         for split in ['val', 'test']:
-            df_split = df_label.query('split == @split')
-            y_true = df_split[label_name]
-            y_score = df_split[positive_pred_name]
+            y_true = group_likelihood.get_values(split, label_name)
+            y_score = group_likelihood.get_values(split, positive_pred_name)
             _fpr, _tpr, _ = metrics.roc_curve(y_true, y_score)
             self._set_roc(label_metrics, split, _fpr, _tpr)
         return label_metrics
 
-    def _cal_label_roc_multi(self, label_name: str, df_group: pd.DataFrame) -> LabelMetrics:
+    def _cal_label_roc_multi(self, label_name: str, pred_name_list: List[str], group_likelihood: GroupLikelihood) -> LabelMetrics:
         """
         Calculate ROC for multi-class by macro average.
 
         Args:
             label_name (str): label name
-            df_group (pd.DataFrame): likelihood for group
+            pred_name_list (List[str]): columns of prediction of label
+            group_likelihood (GroupLikelihood): likelihood for group
 
         Returns:
             LabelMetrics: metrics of 'val' and 'test'
         """
-        required_columns = [column_name for column_name in df_group.columns if label_name in column_name] + ['split']
-        df_label = df_group[required_columns]
-
-        pred_name_list = list(df_label.columns[df_label.columns.str.startswith('pred')])
         class_list = [int(pred_name.rsplit('_', 1)[-1]) for pred_name in pred_name_list]  # [pred_label_0, pred_label_1, pred_label_2] -> [0, 1, 2]
-        num_classes = len(class_list)
 
         label_metrics = LabelMetrics()
         for split in ['val', 'test']:
-            df_split = df_label.query('split == @split')
-            y_true = df_split[label_name]
-            y_true_bin = label_binarize(y_true, classes=class_list)  # Since y_true: List[int], should be class_list: List[int]
-
-            # Compute ROC for each class by OneVsRest
-            _fpr = dict()
-            _tpr = dict()
-            for i, class_name in enumerate(class_list):
-                pred_name = 'pred_' + label_name + '_' + str(class_name)
-                _fpr[class_name], _tpr[class_name], _ = metrics.roc_curve(y_true_bin[:, i], df_split[pred_name])
-
-            # First aggregate all false positive rates
-            all_fpr = np.unique(np.concatenate([_fpr[class_name] for class_name in class_list]))
-
-            # Then interpolate all ROC at this points
-            mean_tpr = np.zeros_like(all_fpr)
-            for class_name in class_list:
-                mean_tpr += np.interp(all_fpr, _fpr[class_name], _tpr[class_name])
-
-            # Finally average it and compute AUC
-            mean_tpr /= num_classes
-
-            _fpr['macro'] = all_fpr
-            _tpr['macro'] = mean_tpr
-            self._set_roc(label_metrics, split, _fpr['macro'], _tpr['macro'])
+            y_true = group_likelihood.get_values(split, label_name)
+            y_score = np.stack([group_likelihood.get_values(split, pred_name) for pred_name in pred_name_list])
+            all_fpr, mean_tpr = self._cal_macro_roc(y_true, y_score, class_list)
+            self._set_roc(label_metrics, split, all_fpr, mean_tpr)
         return label_metrics
 
-    def cal_label_metrics(self, label_name: str, df_group: pd.DataFrame) -> LabelMetrics:
+    @staticmethod
+    def _cal_macro_roc_by_class(y_true: np.ndarray, y_score: np.ndarray, class_list: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate macro-average ROC by running roc_curve for each class.
+
+        Args:
+            y_true (np.ndarray): ground truth
+            y_score (np.ndarray): prediction, whose shape is (num_classes, num_samples)
+            class_list (List[int]): classes in the same order as rows of y_score
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: FPR and TPR of macro average
+        """
+        num_classes = len(class_list)
+        y_true_bin = label_binarize(y_true, classes=class_list)  # Since y_true: List[int], should be class_list: List[int]
+
+        # Compute ROC for each class by OneVsRest
+        _fpr = dict()
+        _tpr = dict()
+        for i, class_name in enumerate(class_list):
+            _fpr[class_name], _tpr[class_name], _ = metrics.roc_curve(y_true_bin[:, i], y_score[i])
+
+        # First aggregate all false positive rates
+        all_fpr = np.unique(np.concatenate([_fpr[class_name] for class_name in class_list]))
+
+        # Then interpolate all ROC at this points
+        mean_tpr = np.zeros_like(all_fpr)
+        for class_name in class_list:
+            mean_tpr += np.interp(all_fpr, _fpr[class_name], _tpr[class_name])
+
+        # Finally average it and compute AUC
+        mean_tpr /= num_classes
+        return all_fpr, mean_tpr
+
+    @staticmethod
+    def _cal_macro_roc_batch(y_true_bin: np.ndarray, y_score: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calculate macro-average ROC by OneVsRest for all classes of all resamples at once.
+        This gives the same values as _cal_macro_roc_by_class for each resample, ie. roc_curve with drop_intermediate and np.interp,
+        but scores of all classes are sorted in a single 2-D operation,
+        and curves of all classes are held in flat arrays, where the points of curve i are starts[i]:ends[i] + 1.
+        Every class should have both positive and negative in every resample.
+
+        Args:
+            y_true_bin (np.ndarray): True if positive, whose shape is (num_resamples, num_classes, num_samples)
+            y_score (np.ndarray): prediction, whose shape is (num_resamples, num_classes, num_samples)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: resample, FPR, and TPR of macro average, which are concatenated in order of resample
+        """
+        num_resamples, num_classes, num_samples = y_score.shape
+        num_curves = num_resamples * num_classes
+        y_score = y_score.reshape(num_curves, num_samples)
+        y_true_bin = y_true_bin.reshape(num_curves, num_samples)
+
+        # Order among tied scores does not matter, since only the last of them is used as threshold.
+        order = np.argsort(-y_score, axis=1)
+        score_sorted = np.take_along_axis(y_score, order, axis=1)
+        tps = np.cumsum(np.take_along_axis(y_true_bin, order, axis=1), axis=1, dtype=np.float64)
+        fps = np.arange(1, num_samples + 1, dtype=np.float64) - tps
+
+        is_threshold = np.ones((num_curves, num_samples), dtype=bool)
+        is_threshold[:, :-1] = (np.diff(score_sorted, axis=1) != 0)
+        curve_idx = np.nonzero(is_threshold)[0]
+        tps = tps[is_threshold]
+        fps = fps[is_threshold]
+
+        # Drop thresholds on a straight line, keeping the first and last of each curve, as drop_intermediate of roc_curve.
+        is_first = np.ones(len(curve_idx), dtype=bool)
+        is_first[1:] = (curve_idx[1:] != curve_idx[:-1])
+        is_last = np.ones(len(curve_idx), dtype=bool)
+        is_last[:-1] = (curve_idx[1:] != curve_idx[:-1])
+        is_kept = is_first | is_last
+        is_kept[1:-1] |= np.logical_or(np.diff(fps, 2), np.diff(tps, 2))
+        curve_idx, tps, fps, is_first = curve_idx[is_kept], tps[is_kept], fps[is_kept], is_first[is_kept]
+
+        # Add (0, 0) to the head of each curve.
+        num_points = len(curve_idx) + num_curves
+        starts = np.flatnonzero(is_first) + np.arange(num_curves)
+        ends = np.append(starts[1:], num_points) - 1
+        _positions = np.arange(len(curve_idx)) + np.cumsum(is_first)
+        point_curve = np.empty(num_points, dtype=np.intp)
+        point_curve[starts] = np.arange(num_curves)
+        point_curve[_positions] = curve_idx
+        _tps = np.zeros(num_points)
+        _tps[_positions] = tps
+        _fps = np.zeros(num_points)
+        _fps[_positions] = fps
+        fpr = _fps / _fps[ends][point_curve]
+        tpr = _tps / _tps[ends][point_curve]
+
+        # Aggregate all FPR of each resample as np.unique does, and index points by it.
+        point_resample = point_curve // num_classes
+        _order = np.lexsort((fpr, point_resample))
+        _is_new = np.ones(num_points, dtype=bool)
+        _is_new[1:] = (fpr[_order][1:] != fpr[_order][:-1]) | (point_resample[_order][1:] != point_resample[_order][:-1])
+        all_fpr = fpr[_order][_is_new]
+        grid_resample = point_resample[_order][_is_new]
+        point_grid = np.empty(num_points, dtype=np.intp)
+        point_grid[_order] = np.cumsum(_is_new) - 1
+        num_grids = np.bincount(grid_resample, minlength=num_resamples)
+        grid_starts = np.cumsum(num_grids) - num_grids
+
+        # Interpolate each curve at all FPR of its resample as np.interp does, in order of (resample, class, FPR).
+        # j is the last point of curve whose FPR <= all_fpr, which is counted from points of curve before the FPR,
+        # since points of the former curves are all counted before.
+        curve_num_grids = num_grids[np.arange(num_curves) // num_classes]
+        query_starts = np.cumsum(curve_num_grids) - curve_num_grids
+        query_curve = np.repeat(np.arange(num_curves), curve_num_grids)
+        query_grid = np.arange(len(query_curve)) - query_starts[query_curve] + grid_starts[query_curve // num_classes]
+        _point_queries = query_starts[point_curve] + point_grid - grid_starts[point_resample]
+        j = np.cumsum(np.bincount(_point_queries, minlength=len(query_curve))) - 1
+        j_next = np.minimum(j + 1, ends[query_curve])
+        query_fpr = all_fpr[query_grid]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            interp_tpr = (tpr[j_next] - tpr[j]) / (fpr[j_next] - fpr[j]) * (query_fpr - fpr[j]) + tpr[j]
+        np.copyto(interp_tpr, tpr[j], where=(fpr[j] == query_fpr))
+
+        # Summed in order of class as well as _cal_macro_roc_by_class.
+        mean_tpr = np.bincount(query_grid, weights=interp_tpr, minlength=len(all_fpr))
+        mean_tpr /= num_classes
+        return grid_resample, all_fpr, mean_tpr
+
+    @classmethod
+    def _cal_macro_roc(cls, y_true: np.ndarray, y_score: np.ndarray, class_list: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate macro-average ROC by OneVsRest.
+
+        Args:
+            y_true (np.ndarray): ground truth
+            y_score (np.ndarray): prediction, whose shape is (num_classes, num_samples)
+            class_list (List[int]): classes in the same order as rows of y_score
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: FPR and TPR of macro average
+        """
+        num_samples = y_score.shape[1]
+        y_true_bin = (np.asarray(class_list).reshape(-1, 1) == np.asarray(y_true).reshape(1, -1))
+        _num_positives = y_true_bin.sum(axis=1)
+
+        # Leave undefined ROC, ie. no positive or negative, and invalid scores to roc_curve, which warns or raises.
+        if (num_samples == 0) or np.any(_num_positives == 0) or np.any(_num_positives == num_samples) or (not np.all(np.isfinite(y_score))):
+            return cls._cal_macro_roc_by_class(y_true, y_score, class_list)
+
+        _, all_fpr, mean_tpr = cls._cal_macro_roc_batch(y_true_bin[np.newaxis], y_score[np.newaxis])
+        return all_fpr, mean_tpr
+
+    @staticmethod
+    def _cal_weighted_auc(y_true_bin: np.ndarray, y_score: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Calculate AUC by rank statistics, ie. probability that score of positive is larger than that of negative,
+        where a tie counts for 0.5, and each sample is repeated by its weight.
+        This is the same as AUC of ROC.
+
+        Args:
+            y_true_bin (np.ndarray): True if positive
+            y_score (np.ndarray): prediction of positive
+            weights (np.ndarray): number of times each sample appears, whose shape is (num_resamples, num_samples)
+
+        Returns:
+            np.ndarray: AUC of each resample, which is nan when no positive or negative
+        """
+        num_resamples = weights.shape[0]
+        _unique_scores, score_ranks = np.unique(y_score, return_inverse=True)
+        num_ranks = len(_unique_scores)
+        _keys = (np.arange(num_resamples) * num_ranks).reshape(-1, 1) + score_ranks
+        positives = np.bincount(_keys[:, y_true_bin].ravel(), weights=weights[:, y_true_bin].ravel(), minlength=num_resamples * num_ranks).reshape(num_resamples, num_ranks)
+        negatives = np.bincount(_keys[:, ~y_true_bin].ravel(), weights=weights[:, ~y_true_bin].ravel(), minlength=num_resamples * num_ranks).reshape(num_resamples, num_ranks)
+        negatives_below = np.cumsum(negatives, axis=1) - negatives
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (positives * (negatives_below + negatives / 2)).sum(axis=1) / (positives.sum(axis=1) * negatives.sum(axis=1))
+
+    def _cal_resampled_macro_auc(self, y_true: np.ndarray, y_score: np.ndarray, class_list: List[int], weights: np.ndarray) -> np.ndarray:
+        """
+        Calculate AUC of macro-average ROC of resamples.
+        Since ROC of each class is interpolated at FPR of the other classes, AUC of it is not the mean of AUC of each class.
+        Then, resamples are drawn as indices from weights, and ROC of all of them are calculated at once.
+        Resamples are split into chunks so that scores of them do not exceed self.max_bootstrap_size defined in class BootstrapMixin.
+
+        Args:
+            y_true (np.ndarray): ground truth
+            y_score (np.ndarray): prediction, whose shape is (num_classes, num_samples)
+            class_list (List[int]): classes in the same order as rows of y_score
+            weights (np.ndarray): number of times each sample appears, whose shape is (num_resamples, num_samples)
+
+        Returns:
+            np.ndarray: AUC of each resample, which is nan when any class has no positive or negative
+        """
+        num_classes, num_samples = y_score.shape
+        y_true_bin = (np.asarray(class_list).reshape(-1, 1) == np.asarray(y_true).reshape(1, -1))
+        _num_positives = weights @ y_true_bin.T.astype(weights.dtype)
+        defined_resamples = np.flatnonzero(((_num_positives > 0) & (_num_positives < num_samples)).all(axis=1))
+
+        aucs = np.full(weights.shape[0], np.nan)
+        _chunk_size = max(1, self.max_bootstrap_size // (num_classes * num_samples))
+        for _start in range(0, len(defined_resamples), _chunk_size):
+            _resamples = defined_resamples[_start:_start + _chunk_size]
+            _indices = np.repeat(np.tile(np.arange(num_samples), len(_resamples)), weights[_resamples].ravel()).reshape(len(_resamples), num_samples)
+            grid_resample, all_fpr, mean_tpr = self._cal_macro_roc_batch(
+                                                                        y_true_bin[:, _indices].transpose(1, 0, 2),
+                                                                        y_score[:, _indices].transpose(1, 0, 2)
+                                                                        )
+            # Trapezoidal rule as metrics.auc within each resample
+            _is_same = (grid_resample[1:] == grid_resample[:-1])
+            _areas = np.diff(all_fpr) * (mean_tpr[1:] + mean_tpr[:-1]) / 2
+            aucs[_resamples] = np.bincount(grid_resample[1:][_is_same], weights=_areas[_is_same], minlength=len(_resamples))
+        return aucs
+
+    def cal_bootstrap_metrics(
+                            self,
+                            label_name: str,
+                            pred_name_list: List[str],
+                            group_likelihood: GroupLikelihood,
+                            split: str,
+                            weights: np.ndarray
+                            ) -> np.ndarray:
+        """
+        Calculate AUC of resamples for label.
+
+        Args:
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label
+            group_likelihood (GroupLikelihood): likelihood for group
+            split (str): 'val' or 'test'
+            weights (np.ndarray): number of times each sample appears, whose shape is (num_resamples, num_samples)
+
+        Returns:
+            np.ndarray: AUC of each resample
+        """
+        y_true = group_likelihood.get_values(split, label_name)
+        isMultiClass = (len(pred_name_list) > 2)
+        if isMultiClass:
+            class_list = [int(pred_name.rsplit('_', 1)[-1]) for pred_name in pred_name_list]
+            y_score = np.stack([group_likelihood.get_values(split, pred_name) for pred_name in pred_name_list])
+            return self._cal_resampled_macro_auc(y_true, y_score, class_list, weights)
+
+        POSITIVE = 1
+        positive_pred_name = 'pred_' + label_name + '_' + str(POSITIVE)
+        return self._cal_weighted_auc(y_true == POSITIVE, group_likelihood.get_values(split, positive_pred_name), weights)
+
+    def cal_label_metrics(self, label_name: str, pred_name_list: List[str], group_likelihood: GroupLikelihood) -> LabelMetrics:
         """
         Calculate ROC and AUC for label depending on binary or multi-class.
 
         Args:
             label_name (str):label name
-            df_group (pd.DataFrame): likelihood for group
+            pred_name_list (List[str]): columns of prediction of label
+            group_likelihood (GroupLikelihood): likelihood for group
 
         Returns:
             LabelMetrics: metrics of 'val' and 'test'
         """
-        pred_name_list = df_group.columns[df_group.columns.str.startswith('pred_' + label_name)]
         isMultiClass = (len(pred_name_list) > 2)
         if isMultiClass:
-            label_metrics = self._cal_label_roc_multi(label_name, df_group)
+            label_metrics = self._cal_label_roc_multi(label_name, pred_name_list, group_likelihood)
         else:
-            label_metrics = self._cal_label_roc_binary(label_name, df_group)
+            label_metrics = self._cal_label_roc_binary(label_name, group_likelihood)
         return label_metrics
 
 
@@ -205,28 +510,78 @@ class YYMixin:
 
         self.metrics_kind = 'r2' is defined in class RegEval below.
         """
-        label_metrics.set_label_metrics(split, 'y_obs', y_obs.values)
-        label_metrics.set_label_metrics(split, 'y_pred', y_pred.values)
+        label_metrics.set_label_metrics(split, 'y_obs', y_obs)
+        label_metrics.set_label_metrics(split, 'y_pred', y_pred)
         label_metrics.set_label_metrics(split, self.metrics_kind, metrics.r2_score(y_obs, y_pred))
 
-    def cal_label_metrics(self, label_name: str, df_group: pd.DataFrame) -> LabelMetrics:
+    @staticmethod
+    def _cal_weighted_r2(y_obs: np.ndarray, y_pred: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Calculate R2 in the same way as metrics.r2_score, where each sample is repeated by its weight.
+        Sums of all resamples are calculated at once by product of weights and values.
+
+        Args:
+            y_obs (np.ndarray): ground truth
+            y_pred (np.ndarray): prediction
+            weights (np.ndarray): number of times each sample appears, whose shape is (num_resamples, num_samples)
+
+        Returns:
+            np.ndarray: R2 of each resample
+        """
+        y_obs = y_obs.astype(np.float64)
+        y_pred = y_pred.astype(np.float64)
+        _weights = weights.astype(np.float64)
+        _means = (_weights @ y_obs) / _weights.sum(axis=1)
+        ss_res = _weights @ np.square(y_obs - y_pred)
+        ss_tot = (_weights * np.square(y_obs - _means.reshape(-1, 1))).sum(axis=1)
+
+        # As metrics.r2_score, 1.0 for perfect prediction, and 0.0 for imperfect prediction when ground truth is constant.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = 1 - ss_res / ss_tot
+        r2[ss_tot == 0] = np.where(ss_res[ss_tot == 0] == 0, 1.0, 0.0)
+        return r2
+
+    def cal_bootstrap_metrics(
+                            self,
+                            label_name: str,
+                            pred_name_list: List[str],
+                            group_likelihood: GroupLikelihood,
+                            split: str,
+                            weights: np.ndarray
+                            ) -> np.ndarray:
+        """
+        Calculate R2 of resamples for label.
+
+        Args:
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label, ie. only 'pred_' + label_name
+            group_likelihood (GroupLikelihood): likelihood for group
+            split (str): 'val' or 'test'
+            weights (np.ndarray): number of times each sample appears, whose shape is (num_resamples, num_samples)
+
+        Returns:
+            np.ndarray: R2 of each resample
+        """
+        y_obs = group_likelihood.get_values(split, label_name)
+        y_pred = group_likelihood.get_values(split, 'pred_' + label_name)
+        return self._cal_weighted_r2(y_obs, y_pred, weights)
+
+    def cal_label_metrics(self, label_name: str, pred_name_list: List[str], group_likelihood: GroupLikelihood) -> LabelMetrics:
         """
         Calculate YY and R2 for label.
 
         Args:
             label_name (str): label name
-            df_group (pd.DataFrame): likelihood for group
+            pred_name_list (List[str]): columns of prediction of label, ie. only 'pred_' + label_name
+            group_likelihood (GroupLikelihood): likelihood for group
 
         Returns:
             LabelMetrics: metrics of 'val' and 'test'
         """
-        required_columns = [column_name for column_name in df_group.columns if label_name in column_name] + ['split']
-        df_label = df_group[required_columns]
         label_metrics = LabelMetrics()
         for split in ['val', 'test']:
-            df_split = df_label.query('split == @split')
-            y_obs = df_split[label_name]
-            y_pred = df_split['pred_' + label_name]
+            y_obs = group_likelihood.get_values(split, label_name)
+            y_pred = group_likelihood.get_values(split, 'pred_' + label_name)
             self._set_yy(label_metrics, split, y_obs, y_pred)
         return label_metrics
 
@@ -235,13 +590,133 @@ class C_IndexMixin:
     """
     Class for calculating C-Index.
     """
+    @staticmethod
+    def _run_bounds(is_start: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return start and end of run which each item belongs to, where items of each run are contiguous.
+
+        Args:
+            is_start (np.ndarray): whether each item is the first of run
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: index of the first item of run, and index next to the last item of run
+        """
+        _starts = np.flatnonzero(is_start)
+        _run_ids = np.cumsum(is_start) - 1
+        return _starts[_run_ids], np.append(_starts[1:], len(is_start))[_run_ids]
+
+    @classmethod
+    def _count_c_index_pairs(cls, periods: np.ndarray, scores: np.ndarray, labels: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count concordant, tied, and admissible pairs, where each subject is repeated by its weight.
+
+        A pair is admissible when the earlier one died, where a death is not compared with another death at the same period,
+        but is compared with a censored one at the same period, which is regarded as later.
+        A pair is concordant when score of the later one is larger, and a pair of the same scores is tied.
+
+        Each subject is queried against the deaths before it in order of period.
+        Deaths are queued as items separate from their queries, and items are sorted by (period, kind),
+        where kind is 0 for query of death, 1 for death, and 2 for query of censored.
+        Then, deaths before each query are counted like merge sort, ie. items are sorted by score once,
+        and at each level from the top bit of positions, items are in order of (block of positions, score),
+        where queries in the right half of a block are counted against deaths in the left half by cumulative weights,
+        and each block is stably partitioned into its halves for the next level.
+        Each level takes O(n), so that it takes O(n log(n)) in total after sorting by score.
+        As positions and ranks do not depend on weights, rows of weights, ie. resamples of bootstrap, are counted at once.
+
+        Args:
+            periods (np.ndarray): periods
+            scores (np.ndarray): scores, ie. (-1)*preds
+            labels (np.ndarray): label, ie. 1 if died, otherwise 0
+            weights (np.ndarray): number of times each subject appears, whose shape is (num_resamples, num_subjects)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: number of concordant, tied, and admissible pairs of each resample
+        """
+        _unique_scores, score_ranks = np.unique(scores, return_inverse=True)
+        is_died = labels.astype(bool)
+
+        num_subjects = len(periods)
+        item_subjects = np.concatenate([np.arange(num_subjects), np.flatnonzero(is_died)])
+        item_kinds = np.concatenate([np.where(is_died, 0, 2), np.ones(is_died.sum(), dtype=int)])
+        num_items = len(item_subjects)
+        item_positions = np.empty(num_items, dtype=np.int64)
+        item_positions[np.lexsort((item_kinds, periods[item_subjects]))] = np.arange(num_items)
+        item_is_died = (item_kinds == 1)
+
+        num_resamples = weights.shape[0]
+        num_pairs = np.zeros(num_resamples, dtype=weights.dtype)
+        num_correct = np.zeros(num_resamples, dtype=weights.dtype)
+        num_tied = np.zeros(num_resamples, dtype=weights.dtype)
+
+        _indices = np.arange(num_items)
+        order = np.argsort(score_ranks[item_subjects], kind='stable')
+        for level in reversed(range(max(num_items - 1, 0).bit_length())):
+            positions = item_positions[order]
+            ranks = score_ranks[item_subjects[order]]
+            is_right = ((positions >> level) & 1) == 1
+            _is_block_start = np.append(True, (positions[1:] >> (level + 1)) != (positions[:-1] >> (level + 1)))
+            block_starts, block_ends = cls._run_bounds(_is_block_start)
+            # Run of the same score in block
+            run_starts, run_ends = cls._run_bounds(_is_block_start | np.append(True, ranks[1:] != ranks[:-1]))
+
+            # Cumulative weights of deaths in the left halves, so that weights between two items are difference of them.
+            _died_weights = np.where(item_is_died[order] & ~is_right, weights[:, item_subjects[order]], 0)
+            _cum_weights = np.zeros((num_resamples, num_items + 1), dtype=weights.dtype)
+            np.cumsum(_died_weights, axis=1, out=_cum_weights[:, 1:])
+
+            _queries = np.flatnonzero(is_right & ~item_is_died[order])
+            query_weights = weights[:, item_subjects[order[_queries]]]
+            _start = _cum_weights[:, block_starts[_queries]]
+            _lower = _cum_weights[:, run_starts[_queries]]
+            _upper = _cum_weights[:, run_ends[_queries]]
+            _end = _cum_weights[:, block_ends[_queries]]
+            num_pairs += (query_weights * (_end - _start)).sum(axis=1)
+            num_correct += (query_weights * (_lower - _start)).sum(axis=1)
+            num_tied += (query_weights * (_upper - _lower)).sum(axis=1)
+
+            # Partition each block into left and right halves keeping order of score.
+            _cum_left = np.append(0, np.cumsum(~is_right))
+            _num_left_before = _cum_left[:-1] - _cum_left[block_starts]
+            _num_left = _cum_left[block_ends] - _cum_left[block_starts]
+            _destinations = block_starts + np.where(is_right, _num_left + (_indices - block_starts - _num_left_before), _num_left_before)
+            _order = np.empty_like(order)
+            _order[_destinations] = order
+            order = _order
+        return num_correct, num_tied, num_pairs
+
+    @classmethod
+    def _cal_c_index(cls, periods: np.ndarray, preds: np.ndarray, labels: np.ndarray) -> float:
+        """
+        Calculate Harrell's C-Index, which is the same as lifelines.utils.concordance_index(periods, (-1)*preds, labels).
+
+        Args:
+            periods (np.ndarray): periods
+            preds (np.ndarray): prediction
+            labels (np.ndarray): label, ie. 1 if died, otherwise 0
+
+        Returns:
+            float: C-Index
+        """
+        periods = np.asarray(periods, dtype=float)
+        scores = np.asarray((-1)*preds, dtype=float)
+        labels = np.asarray(labels, dtype=float)
+        if np.isnan(periods).any() or np.isnan(scores).any() or np.isnan(labels).any():
+            raise ValueError('NaNs detected in inputs, please correct or drop.')
+
+        _weights = np.ones((1, len(periods)), dtype=np.int64)
+        num_correct, num_tied, num_pairs = (count[0] for count in cls._count_c_index_pairs(periods, scores, labels, _weights))
+        if num_pairs == 0:
+            raise ZeroDivisionError('No admissable pairs in the dataset.')
+        return (num_correct + num_tied / 2) / num_pairs
+
     def _set_c_index(
                     self,
                     label_metrics: LabelMetrics,
                     split: str,
-                    periods: pd.Series,
-                    preds: pd.Series,
-                    labels: pd.Series
+                    periods: np.ndarray,
+                    preds: np.ndarray,
+                    labels: np.ndarray
                     ) -> None:
         """
         Set C-Index.
@@ -249,61 +724,217 @@ class C_IndexMixin:
         Args:
             label_metrics (LabelMetrics): metrics of 'val' and 'test'
             split (str): 'val' or 'test'
-            periods (pd.Series): periods
-            preds (pd.Series): prediction
-            labels (pd.Series): label
+            periods (np.ndarray): periods
+            preds (np.ndarray): prediction
+            labels (np.ndarray): label
 
         self.metrics_kind = 'c_index' is defined in class DeepSurvEval below.
         """
-        from lifelines.utils import concordance_index
-        value_c_index = concordance_index(periods, (-1)*preds, labels)
+        value_c_index = self._cal_c_index(periods, preds, labels)
         label_metrics.set_label_metrics(split, self.metrics_kind, value_c_index)
 
-    def cal_label_metrics(self, label_name: str, df_group: pd.DataFrame) -> LabelMetrics:
+    def cal_bootstrap_metrics(
+                            self,
+                            label_name: str,
+                            pred_name_list: List[str],
+                            group_likelihood: GroupLikelihood,
+                            split: str,
+                            weights: np.ndarray
+                            ) -> np.ndarray:
+        """
+        Calculate C-Index of resamples for label.
+
+        Args:
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label, ie. only 'pred_' + label_name
+            group_likelihood (GroupLikelihood): likelihood for group
+            split (str): 'val' or 'test'
+            weights (np.ndarray): number of times each sample appears, whose shape is (num_resamples, num_samples)
+
+        Returns:
+            np.ndarray: C-Index of each resample, which is nan when no admissible pair
+        """
+        periods = group_likelihood.get_values(split, 'periods').astype(float)
+        scores = ((-1)*group_likelihood.get_values(split, 'pred_' + label_name)).astype(float)
+        labels = group_likelihood.get_values(split, label_name).astype(float)
+        num_correct, num_tied, num_pairs = self._count_c_index_pairs(periods, scores, labels, weights)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (num_correct + num_tied / 2) / num_pairs
+
+    def cal_label_metrics(self, label_name: str, pred_name_list: List[str], group_likelihood: GroupLikelihood) -> LabelMetrics:
         """
         Calculate C-Index for label.
 
         Args:
             label_name (str): label name
-            df_group (pd.DataFrame): likelihood for group
+            pred_name_list (List[str]): columns of prediction of label, ie. only 'pred_' + label_name
+            group_likelihood (GroupLikelihood): likelihood for group
 
         Returns:
             LabelMetrics: metrics of 'val' and 'test'
         """
-        required_columns = [column_name for column_name in df_group.columns if label_name in column_name] + ['periods', 'split']
-        df_label = df_group[required_columns]
         label_metrics = LabelMetrics()
         for split in ['val', 'test']:
-            df_split = df_label.query('split == @split')
-            periods = df_split['periods']
-            preds = df_split['pred_' + label_name]
-            labels = df_split[label_name]
+            periods = group_likelihood.get_values(split, 'periods')
+            preds = group_likelihood.get_values(split, 'pred_' + label_name)
+            labels = group_likelihood.get_values(split, label_name)
             self._set_c_index(label_metrics, split, periods, preds, labels)
         return label_metrics
 
 
+class BootstrapMixin:
+    """
+    Class to calculate confidence interval of metrics by bootstrap.
+
+    Resamples are drawn as a matrix of indices at once, and counted into weights, ie. the number of times each sample appears,
+    so that metrics of all resamples are calculated in batch by cal_bootstrap_metrics() of ROCMixin, YYMixin, or C_IndexMixin.
+    Confidence interval is percentile of metrics of resamples, where resamples whose metrics is not defined are ignored.
+    """
+    ci_level = 0.95
+    max_bootstrap_size = 2**22  # Upper limit of num_resamples * num_samples of indices drawn at once
+
+    def _draw_bootstrap_weights(self, rng: np.random.Generator, num_samples: int) -> Iterator[np.ndarray]:
+        """
+        Draw weights of self.num_bootstrap resamples.
+        Resamples are drawn in chunks so that indices do not exceed max_bootstrap_size.
+
+        Args:
+            rng (np.random.Generator): random generator
+            num_samples (int): number of samples
+
+        Yields:
+            np.ndarray: number of times each sample appears, whose shape is (num_resamples, num_samples)
+        """
+        _chunk_size = max(1, self.max_bootstrap_size // num_samples)
+        for _start in range(0, self.num_bootstrap, _chunk_size):
+            num_resamples = min(_chunk_size, self.num_bootstrap - _start)
+            _indices = rng.integers(0, num_samples, size=(num_resamples, num_samples))
+            _indices += (np.arange(num_resamples) * num_samples).reshape(-1, 1)
+            yield np.bincount(_indices.ravel(), minlength=num_resamples * num_samples).reshape(num_resamples, num_samples)
+
+    def cal_label_ci(
+                    self,
+                    label_metrics: LabelMetrics,
+                    label_name: str,
+                    pred_name_list: List[str],
+                    group_likelihood: GroupLikelihood,
+                    rng: np.random.Generator
+                    ) -> None:
+        """
+        Calculate confidence interval of metrics for label, and set it into label_metrics.
+
+        Args:
+            label_metrics (LabelMetrics): metrics of 'val' and 'test'
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label
+            group_likelihood (GroupLikelihood): likelihood for group
+            rng (np.random.Generator): random generator
+        """
+        _alpha = (1 - self.ci_level) / 2
+        for split in ['val', 'test']:
+            num_samples = len(group_likelihood.get_values(split, label_name))
+            ci_lower, ci_upper = np.nan, np.nan
+            if num_samples > 0:
+                _values = np.concatenate([
+                                        self.cal_bootstrap_metrics(label_name, pred_name_list, group_likelihood, split, weights)
+                                        for weights in self._draw_bootstrap_weights(rng, num_samples)
+                                        ])
+                if not np.isnan(_values).all():
+                    ci_lower, ci_upper = np.nanquantile(_values, [_alpha, 1 - _alpha])
+            label_metrics.set_label_metrics(split, 'ci_lower', ci_lower)
+            label_metrics.set_label_metrics(split, 'ci_upper', ci_upper)
+
+
 class MetricsMixin:
     """
     Class to calculate metrics and make summary.
     """
-    def _cal_group_metrics(self, df_group: pd.DataFrame) -> Dict[str, LabelMetrics]:
+    extra_metrics_kinds = []  # Kinds of metrics put into summary after metrics_kind without confidence interval, eg. 'rmse'
+
+    @staticmethod
+    def is_required_column(column_name: str) -> bool:
+        """
+        Check if column of likelihood is required to calculate metrics.
+        uniqID and imgpath are not read.
+
+        Args:
+            column_name (str): column name
+
+        Returns:
+            bool: True if required
+        """
+        return (column_name in ['group', 'split', 'periods']) or column_name.startswith('label') or column_name.startswith('pred')
+
+    def map_groups(self, func: Callable, *iterables) -> List[Any]:
+        """
+        Apply func to each group.
+        When num_workers > 1, groups are processed in a process pool, and results are returned in order of groups.
+
+        Args:
+            func (Callable): function for group
+            iterables: arguments for each group
+
+        Returns:
+            List[Any]: results in order of groups
+        """
+        if self.num_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                return list(executor.map(func, *iterables))
+        return list(map(func, *iterables))
+
+    def _cal_group_metrics(
+                        self,
+                        pred_columns: Dict[str, List[str]],
+                        group_likelihood: GroupLikelihood,
+                        bootstrap_seed: np.random.SeedSequence = None
+                        ) -> Dict[str, LabelMetrics]:
         """
         Calculate metrics for each group.
+        When self.num_bootstrap > 0, confidence interval is also calculated.
 
         Args:
-            df_group (pd.DataFrame): likelihood for group
+            pred_columns (Dict[str, List[str]]): label and columns of its prediction
+            group_likelihood (GroupLikelihood): likelihood for group
+            bootstrap_seed (np.random.SeedSequence, optional): seed of bootstrap for group. Defaults to None.
 
         Returns:
             Dict[str, LabelMetrics]: dictionary of label and its LabelMetrics
             eg. {{label_1: LabelMetrics(), label_2: LabelMetrics(), ...}
         """
-        label_list = list(df_group.columns[df_group.columns.str.startswith('label')])
+        if self.num_bootstrap > 0:
+            rng = np.random.default_rng(bootstrap_seed)
+
         group_metrics = dict()
-        for label_name in label_list:
-            label_metrics = self.cal_label_metrics(label_name, df_group)
+        for label_name, pred_name_list in pred_columns.items():
+            label_metrics = self.cal_label_metrics(label_name, pred_name_list, group_likelihood)
+            if self.num_bootstrap > 0:
+                self.cal_label_ci(label_metrics, label_name, pred_name_list, group_likelihood, rng)
             group_metrics[label_name] = label_metrics
         return group_metrics
 
+    def _make_pred_columns(self, column_names: List[str]) -> Dict[str, List[str]]:
+        """
+        Make columns of prediction for each label.
+
+        Args:
+            column_names (List[str]): columns of likelihood
+
+        Returns:
+            Dict[str, List[str]]: label and columns of its prediction
+
+        eg.
+        [..., label_A, pred_label_A_0, pred_label_A_1, label_B, pred_label_B] -> {label_A: [pred_label_A_0, pred_label_A_1], label_B: [pred_label_B]}
+        """
+        label_list = [column_name for column_name in column_names if column_name.startswith('label')]
+        pred_columns = dict()
+        for label_name in label_list:
+            _pred_name = 'pred_' + label_name
+            pred_columns[label_name] = [
+                                        column_name for column_name in column_names
+                                        if (column_name == _pred_name) or (column_name.startswith(_pred_name + '_') and column_name.rsplit('_', 1)[-1].isdigit())
+                                        ]
+        return pred_columns
+
     def cal_whole_metrics(self, df_likelihood: pd.DataFrame) -> Dict[str, Dict[str, LabelMetrics]]:
         """
         Calculate metrics for all groups.
@@ -318,10 +949,24 @@ class MetricsMixin:
                 groupB: {label_1: LabelMetrics(), label_2: LabelMetrics()}, ...},
                 ...}
         """
-        whole_metrics = dict()
-        for group in df_likelihood['group'].unique():
-            df_group = df_likelihood.query('group == @group')
-            whole_metrics[group] = self._cal_group_metrics(df_group)
+        # Rows of each group and split are partitioned at once, and columns are converted into np.ndarray once.
+        _columns = {column_name: df_likelihood[column_name].to_numpy() for column_name in df_likelihood.columns}
+        _partition = df_likelihood.groupby(['group', 'split'], sort=False).indices
+        _split_indices = {group: dict() for group in df_likelihood['group'].unique()}
+        for (group, split), indices in _partition.items():
+            _split_indices[group][split] = indices
+
+        pred_columns = self._make_pred_columns(list(df_likelihood.columns))
+
+        group_likelihoods = [GroupLikelihood(_columns, split_indices) for split_indices in _split_indices.values()]
+        if self.num_workers > 1:
+            # Only rows of each group are passed to worker.
+            group_likelihoods = [group_likelihood.compact() for group_likelihood in group_likelihoods]
+
+        # Seed of each group is derived from self.seed, so that confidence interval does not depend on num_workers.
+        bootstrap_seeds = np.random.SeedSequence(self.seed).spawn(len(group_likelihoods))
+        _group_metrics = self.map_groups(self._cal_group_metrics, [pred_columns] * len(group_likelihoods), group_likelihoods, bootstrap_seeds)
+        whole_metrics = dict(zip(_split_indices.keys(), _group_metrics))
         return whole_metrics
 
     def make_summary(
@@ -353,7 +998,17 @@ class MetricsMixin:
                 _val_metrics = label_metrics.get_label_metrics('val', metrics_kind)
                 _test_metrics = label_metrics.get_label_metrics('test', metrics_kind)
                 _new[label_name + '_val_' + metrics_kind] = [f"{_val_metrics:.2f}"]
+                if self.num_bootstrap > 0:
+                    _new[label_name + '_val_' + metrics_kind + '_ci_lower'] = [f"{label_metrics.get_label_metrics('val', 'ci_lower'):.2f}"]
+                    _new[label_name + '_val_' + metrics_kind + '_ci_upper'] = [f"{label_metrics.get_label_metrics('val', 'ci_upper'):.2f}"]
+                for _kind in self.extra_metrics_kinds:
+                    _new[label_name + '_val_' + _kind] = [f"{label_metrics.get_label_metrics('val', _kind):.2f}"]
                 _new[label_name + '_test_' + metrics_kind] = [f"{_test_metrics:.2f}"]
+                if self.num_bootstrap > 0:
+                    _new[label_name + '_test_' + metrics_kind + '_ci_lower'] = [f"{label_metrics.get_label_metrics('test', 'ci_lower'):.2f}"]
+                    _new[label_name + '_test_' + metrics_kind + '_ci_upper'] = [f"{label_metrics.get_label_metrics('test', 'ci_upper'):.2f}"]
+                for _kind in self.extra_metrics_kinds:
+                    _new[label_name + '_test_' + _kind] = [f"{label_metrics.get_label_metrics('test', _kind):.2f}"]
             df_summary = pd.concat([df_summary, pd.DataFrame(_new)], ignore_index=True)
 
         df_summary = df_summary.sort_values('group')
@@ -367,20 +1022,27 @@ class MetricsMixin:
             df_summary (pd.DataFrame): summary
             metrics_kind (str): kind of metrics, ie. 'auc', 'r2', or 'c_index'
         """
-        label_list = list(df_summary.columns[df_summary.columns.str.startswith('label')])  # [label_1_val, label_1_test, label_2_val, label_2_test, ...]
-        num_splits = len(['val', 'test'])
-        _column_val_test_list = [label_list[i:i+num_splits] for i in range(0, len(label_list), num_splits)]  # [[label_1_val, label_1_test], [label_2_val, label_2_test], ...]
+        # Columns of val and test are paired by label, since columns of confidence interval may follow them.
+        _val_suffix = '_val_' + metrics_kind
+        label_list = [column_name[:-len(_val_suffix)] for column_name in df_summary.columns if column_name.endswith(_val_suffix)]  # [label_1, label_2, ...]
         for _, row in df_summary.iterrows():
             logger.info(row['group'])
-            for _column_val_test in _column_val_test_list:
-                _label_name = _column_val_test[0].replace('_val', '')
-                _label_name_val = _column_val_test[0]
-                _label_name_test = _column_val_test[1]
-                logger.info(f"{_label_name:<25} val_{metrics_kind}: {row[_label_name_val]:>7}, test_{metrics_kind}: {row[_label_name_test]:>7}")
+            for label_name in label_list:
+                for _kind in [metrics_kind, *self.extra_metrics_kinds]:
+                    _split_metrics = []
+                    for split in ['val', 'test']:
+                        _column_name = label_name + '_' + split + '_' + _kind
+                        _metrics = f"{split}_{_kind}: {row[_column_name]:>7}"
+                        if (_column_name + '_ci_lower') in row.index:
+                            _metrics = _metrics + f" ({row[_column_name + '_ci_lower']}-{row[_column_name + '_ci_upper']})"
+                        _split_metrics.append(_metrics)
+                    _label_name = label_name + '_' + _kind
+                    logger.info(f"{_label_name:<25} " + ', '.join(_split_metrics))
 
     def update_summary(self, df_summary: pd.DataFrame, likelihood_path: Path) -> None:
         """
         Update summary.
+        Summary is appended into summary.db, which is exported into summary.csv on demand by export_summary.py.
 
         Args:
             df_summary (pd.DataFrame): summary to be added to the previous summary
@@ -388,14 +1050,7 @@ class MetricsMixin:
         """
         _project_dir = likelihood_path.parents[3]
         summary_dir = Path(_project_dir, 'summary')
-        summary_path = Path(summary_dir, 'summary.csv')
-        if summary_path.exists():
-            df_prev = pd.read_csv(summary_path)
-            df_updated = pd.concat([df_prev, df_summary], axis=0)
-        else:
-            summary_dir.mkdir(parents=True, exist_ok=True)
-            df_updated = df_summary
-        df_updated.to_csv(summary_path, index=False)
+        set_summary_store(summary_dir).append(df_summary)
 
     def make_metrics(self, likelihood_path: Path) -> None:
         """
@@ -404,7 +1059,7 @@ class MetricsMixin:
         Args:
             likelihood_path (Path): path to likelihood
         """
-        df_likelihood = pd.read_csv(likelihood_path)
+        df_likelihood = read_likelihood(likelihood_path, columns=self.is_required_column)
         whole_metrics = self.cal_whole_metrics(df_likelihood)
         self.make_save_fig(whole_metrics, likelihood_path, self.fig_kind)
         df_summary = self.make_summary(whole_metrics, likelihood_path, self.metrics_kind)
@@ -553,38 +1208,75 @@ class FigMixin:
         save_dir = Path(_datetime_dir, fig_kind)
         save_dir.mkdir(parents=True, exist_ok=True)
         _fig_name = fig_kind + '_' + likelihood_path.stem.replace('likelihood_', '')
-        for group, group_metrics in whole_metrics.items():
-            fig = self._plot_fig_group_metrics(group, group_metrics)
-            save_path = Path(save_dir, group + '_' + _fig_name + '.png')
-            fig.savefig(save_path)
-            plt.close()
+        save_paths = [Path(save_dir, group + '_' + _fig_name + '.png') for group in whole_metrics.keys()]
+        self.map_groups(self._save_fig_group_metrics, whole_metrics.keys(), whole_metrics.values(), save_paths)
 
+    def _save_fig_group_metrics(self, group: str, group_metrics: Dict[str, LabelMetrics], save_path: Path) -> None:
+        """
+        Make and save figure for group.
 
-class ClsEval(MetricsMixin, ROCMixin, FigMixin, FigROCMixin):
+        Args:
+            group (str): group
+            group_metrics (Dict[str, LabelMetrics]): dictionary of label and its LabelMetrics
+            save_path (Path): path to figure
+        """
+        fig = self._plot_fig_group_metrics(group, group_metrics)
+        fig.savefig(save_path)
+        plt.close(fig)
+
+
+class ClsEval(MetricsMixin, BootstrapMixin, ROCMixin, FigMixin, FigROCMixin):
     """
     Class for calculation metrics for classification.
     """
-    def __init__(self) -> None:
+    def __init__(self, num_workers: int = 1, num_bootstrap: int = 0, seed: int = 0) -> None:
+        """
+        Args:
+            num_workers (int): number of processes to calculate metrics and save figures of groups. Defaults to 1.
+            num_bootstrap (int): number of resamples of bootstrap for confidence interval, or 0 not to calculate it. Defaults to 0.
+            seed (int): seed of bootstrap. Defaults to 0.
+        """
         self.fig_kind = 'roc'
         self.metrics_kind = 'auc'
+        self.num_workers = num_workers
+        self.num_bootstrap = num_bootstrap
+        self.seed = seed
 
 
-class RegEval(MetricsMixin, YYMixin, FigMixin, FigYYMixin):
+class RegEval(MetricsMixin, BootstrapMixin, YYMixin, FigMixin, FigYYMixin):
     """
     Class for calculation metrics for regression.
     """
-    def __init__(self) -> None:
+    def __init__(self, num_workers: int = 1, num_bootstrap: int = 0, seed: int = 0) -> None:
+        """
+        Args:
+            num_workers (int): number of processes to calculate metrics and save figures of groups. Defaults to 1.
+            num_bootstrap (int): number of resamples of bootstrap for confidence interval, or 0 not to calculate it. Defaults to 0.
+            seed (int): seed of bootstrap. Defaults to 0.
+        """
         self.fig_kind = 'yy'
         self.metrics_kind = 'r2'
+        self.num_workers = num_workers
+        self.num_bootstrap = num_bootstrap
+        self.seed = seed
 
 
-class DeepSurvEval(MetricsMixin, C_IndexMixin):
+class DeepSurvEval(MetricsMixin, BootstrapMixin, C_IndexMixin):
     """
     Class for calculation metrics for DeepSurv.
     """
-    def __init__(self) -> None:
+    def __init__(self, num_workers: int = 1, num_bootstrap: int = 0, seed: int = 0) -> None:
+        """
+        Args:
+            num_workers (int): number of processes to calculate metrics of groups. Defaults to 1.
+            num_bootstrap (int): number of resamples of bootstrap for confidence interval, or 0 not to calculate it. Defaults to 0.
+            seed (int): seed of bootstrap. Defaults to 0.
+        """
         self.fig_kind = None
         self.metrics_kind = 'c_index'
+        self.num_workers = num_workers
+        self.num_bootstrap = num_bootstrap
+        self.seed = seed
 
     def make_metrics(self, likelihood_path: Path) -> None:
         """
@@ -596,28 +1288,536 @@ class DeepSurvEval(MetricsMixin, C_IndexMixin):
         Overwrite def make_metrics() in class MetricsMixin by deleting self.make_save_fig(),
         because of no need to plot and save figure.
         """
-        df_likelihood = pd.read_csv(likelihood_path)
+        df_likelihood = read_likelihood(likelihood_path, columns=self.is_required_column)
         whole_metrics = self.cal_whole_metrics(df_likelihood)
         df_summary = self.make_summary(whole_metrics, likelihood_path, self.metrics_kind)
         self.print_metrics(df_summary, self.metrics_kind)
         self.update_summary(df_summary, likelihood_path)
 
 
-def set_eval(task: str) -> Union[ClsEval, RegEval, DeepSurvEval]:
+def set_eval(task: str, num_workers: int = 1, num_bootstrap: int = 0, seed: int = 0) -> Union[ClsEval, RegEval, DeepSurvEval]:
     """
     Set class for evaluation depending on task depending on task.
 
     Args:
         task (str): task
+        num_workers (int): number of processes to calculate metrics and save figures of groups. Defaults to 1.
+        num_bootstrap (int): number of resamples of bootstrap for confidence interval, or 0 not to calculate it. Defaults to 0.
+        seed (int): seed of bootstrap. Defaults to 0.
 
     Returns:
         Union[ClsEval, RegEval, DeepSurvEval]: class for evaluation
     """
     if task == 'classification':
-        return ClsEval()
+        return ClsEval(num_workers=num_workers, num_bootstrap=num_bootstrap, seed=seed)
+    elif task == 'regression':
+        return RegEval(num_workers=num_workers, num_bootstrap=num_bootstrap, seed=seed)
+    elif task == 'deepsurv':
+        return DeepSurvEval(num_workers=num_workers, num_bootstrap=num_bootstrap, seed=seed)
+    else:
+        raise ValueError(f"Invalid task: {task}.")
+
+
+class StreamingMetricsMixin:
+    """
+    Class to accumulate metrics of batches during test, instead of calculating them from likelihood after test.
+
+    State of each group, label, and split is updated with columns of each batch made by Likelihood.make_columns(),
+    whose size does not depend on the number of samples.
+    Metrics are calculated from the states with update_label_state() and set_label_metrics() defined in the streaming mixins below.
+    """
+    def update(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Update states with batch.
+
+        Args:
+            columns (Dict[str, np.ndarray]): columns of likelihood of batch
+        """
+        if self.pred_columns is None:
+            self.pred_columns = self._make_pred_columns(list(columns.keys()))
+
+        # Rows are partitioned by integer codes of (group, split), since pandas is too slow for every batch.
+        _groups, _group_codes = np.unique(columns['group'], return_inverse=True)
+        _splits, _split_codes = np.unique(columns['split'], return_inverse=True)
+        _keys, _key_codes = np.unique(_group_codes * len(_splits) + _split_codes, return_inverse=True)
+        for i, key in enumerate(_keys):
+            group, split = _groups[key // len(_splits)], _splits[key % len(_splits)]
+            indices = slice(None) if (len(_keys) == 1) else np.flatnonzero(_key_codes == i)
+            _group_states = self.states.setdefault(group, dict())
+            for label_name, pred_name_list in self.pred_columns.items():
+                _split_states = _group_states.setdefault(label_name, dict())
+                _columns = {column_name: columns[column_name][indices] for column_name in [label_name, *pred_name_list, *self.extra_columns]}
+                _split_states[split] = self.update_label_state(_split_states.get(split), label_name, pred_name_list, _columns)
+
+    def cal_whole_metrics(self) -> Dict[str, Dict[str, LabelMetrics]]:
+        """
+        Calculate metrics for all groups from states.
+
+        Returns:
+            Dict[str, Dict[str, LabelMetrics]]: dictionary of group and dictionary of label and its LabelMetrics
+        """
+        whole_metrics = dict()
+        for group, group_states in self.states.items():
+            group_metrics = dict()
+            for label_name, split_states in group_states.items():
+                label_metrics = LabelMetrics()
+                for split in ['val', 'test']:
+                    self.set_label_metrics(label_metrics, split, split_states.get(split))
+                group_metrics[label_name] = label_metrics
+            whole_metrics[group] = group_metrics
+        return whole_metrics
+
+    def make_metrics(self, likelihood_path: Path) -> None:
+        """
+        Make summary of metrics, and print and save it as well as MetricsMixin.make_metrics().
+        Figure is not made, since ROC and YY-graph need all samples.
+
+        Args:
+            likelihood_path (Path): path to likelihood, which is used for datetime, weight, and summary directory
+        """
+        whole_metrics = self.cal_whole_metrics()
+        df_summary = self.make_summary(whole_metrics, likelihood_path, self.metrics_kind)
+        self.print_metrics(df_summary, self.metrics_kind)
+        self.update_summary(df_summary, likelihood_path)
+
+
+class StreamingROCMixin:
+    """
+    Class to accumulate histogram of scores for ROC and AUC.
+    Since scores are outputs of the network, ie. logits whose range is not known in advance,
+    the first num_calibration_samples scores of each curve are kept, and edges of num_bins bins are set at their quantiles.
+    Then, scores are counted in the bins, where scores outside the edges are counted in the first or the last bin.
+    ROC is calculated at edges of bins, ie. scores in the same bin are regarded as tied,
+    which is exact when the number of distinct scores is less than num_bins.
+    """
+    num_bins = 1000
+    num_calibration_samples = 10000
+
+    def _set_edges(self, y_score: np.ndarray) -> List[np.ndarray]:
+        """
+        Set edges of bins of each curve.
+
+        Args:
+            y_score (np.ndarray): scores of each curve, whose shape is (num_curves, num_samples)
+
+        Returns:
+            List[np.ndarray]: edges of each curve, where the i-th bin has scores between the (i-1)-th and the i-th edges
+        """
+        edges = []
+        for _score in y_score:
+            _unique_scores = np.unique(_score)
+            if len(_unique_scores) <= self.num_bins:
+                # Each distinct score has its own bin.
+                edges.append(_unique_scores[1:])
+            else:
+                edges.append(np.unique(np.quantile(_score, np.arange(1, self.num_bins) / self.num_bins)))
+        return edges
+
+    def _count_bins(self, edges: List[np.ndarray], y_true_bin: np.ndarray, y_score: np.ndarray) -> np.ndarray:
+        """
+        Count negatives and positives in bins of each curve.
+
+        Args:
+            edges (List[np.ndarray]): edges of each curve
+            y_true_bin (np.ndarray): whether positive for each curve, whose shape is (num_curves, num_samples)
+            y_score (np.ndarray): scores of each curve, whose shape is (num_curves, num_samples)
+
+        Returns:
+            np.ndarray: histogram, whose shape is (num_curves, 2, num_bins) for negative and positive
+        """
+        num_curves = y_score.shape[0]
+        _bins = np.stack([np.searchsorted(_edges, _score, side='right') for _edges, _score in zip(edges, y_score)])
+        _keys = ((np.arange(num_curves).reshape(-1, 1) * 2 + y_true_bin) * self.num_bins + _bins).ravel()
+        return np.bincount(_keys, minlength=num_curves * 2 * self.num_bins).reshape(num_curves, 2, self.num_bins)
+
+    def _calibrate(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Set edges from pending scores, and count them in the bins.
+
+        Args:
+            state (Dict[str, Any]): state
+
+        Returns:
+            Dict[str, Any]: state without pending scores
+        """
+        y_true_bin = np.concatenate([_y_true_bin for _y_true_bin, _ in state['pending']], axis=1)
+        y_score = np.concatenate([_y_score for _, _y_score in state['pending']], axis=1)
+        state['edges'] = self._set_edges(y_score)
+        state['counts'] = self._count_bins(state['edges'], y_true_bin, y_score)
+        state['pending'] = []
+        state['num_pending'] = 0
+        return state
+
+    def update_label_state(self, state: Dict[str, Any], label_name: str, pred_name_list: List[str], columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        Add batch to histogram of label.
+        Batches are kept pending until num_calibration_samples samples are given, and edges of bins are set.
+
+        Args:
+            state (Dict[str, Any]): edges and histogram, and pending batches, or None at first
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label
+            columns (Dict[str, np.ndarray]): columns of batch
+
+        Returns:
+            Dict[str, Any]: updated state
+        """
+        y_true = columns[label_name]
+        isMultiClass = (len(pred_name_list) > 2)
+        if isMultiClass:
+            # OneVsRest for each class
+            class_list = [int(pred_name.rsplit('_', 1)[-1]) for pred_name in pred_name_list]
+            y_score = np.stack([columns[pred_name] for pred_name in pred_name_list])
+            y_true_bin = (np.asarray(class_list).reshape(-1, 1) == y_true.reshape(1, -1))
+        else:
+            POSITIVE = 1
+            y_score = columns['pred_' + label_name + '_' + str(POSITIVE)].reshape(1, -1)
+            y_true_bin = (y_true == POSITIVE).reshape(1, -1)
+
+        if state is None:
+            state = {'edges': None, 'counts': None, 'pending': [], 'num_pending': 0}
+
+        if state['edges'] is None:
+            state['pending'].append((y_true_bin, y_score))
+            state['num_pending'] = state['num_pending'] + y_score.shape[1]
+            if state['num_pending'] >= self.num_calibration_samples:
+                state = self._calibrate(state)
+            return state
+
+        state['counts'] += self._count_bins(state['edges'], y_true_bin, y_score)
+        return state
+
+    @staticmethod
+    def _cal_histogram_roc(negatives: np.ndarray, positives: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate ROC from histogram, where thresholds are at edges of bins which have any sample.
+
+        Args:
+            negatives (np.ndarray): histogram of negatives
+            positives (np.ndarray): histogram of positives
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: FPR and TPR, or None when no positive or negative
+        """
+        _is_threshold = (negatives + positives)[::-1] > 0
+        fps = np.cumsum(negatives[::-1])[_is_threshold].astype(np.float64)
+        tps = np.cumsum(positives[::-1])[_is_threshold].astype(np.float64)
+
+        # Drop thresholds on a straight line as drop_intermediate of roc_curve, since they change macro average.
+        if len(fps) > 2:
+            _is_kept = np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True]
+            fps, tps = fps[_is_kept], tps[_is_kept]
+
+        fps = np.r_[0, fps]
+        tps = np.r_[0, tps]
+        if (fps[-1] == 0) or (tps[-1] == 0):
+            return None
+        return fps / fps[-1], tps / tps[-1]
+
+    def set_label_metrics(self, label_metrics: LabelMetrics, split: str, state: Dict[str, Any]) -> None:
+        """
+        Set fpr, tpr, and auc of split from histogram.
+        For multi-class, ROC is macro-averaged as ROCMixin._cal_macro_roc_by_class().
+
+        Args:
+            label_metrics (LabelMetrics): metrics of 'val' and 'test'
+            split (str): 'val' or 'test'
+            state (Dict[str, Any]): edges and histogram, or None when no sample
+        """
+        if (state is not None) and (state['edges'] is None):
+            # Fewer samples than num_calibration_samples
+            state = self._calibrate(state)
+        _curves = [] if state is None else [self._cal_histogram_roc(*_counts) for _counts in state['counts']]
+        if (len(_curves) == 0) or any(_curve is None for _curve in _curves):
+            label_metrics.set_label_metrics(split, 'fpr', np.array([np.nan]))
+            label_metrics.set_label_metrics(split, 'tpr', np.array([np.nan]))
+            label_metrics.set_label_metrics(split, self.metrics_kind, np.nan)
+            return
+
+        if len(_curves) == 1:
+            fpr, tpr = _curves[0]
+        else:
+            fpr = np.unique(np.concatenate([_fpr for _fpr, _ in _curves]))
+            tpr = np.zeros_like(fpr)
+            for _fpr, _tpr in _curves:
+                tpr += np.interp(fpr, _fpr, _tpr)
+            tpr /= len(_curves)
+        label_metrics.set_label_metrics(split, 'fpr', fpr)
+        label_metrics.set_label_metrics(split, 'tpr', tpr)
+        label_metrics.set_label_metrics(split, self.metrics_kind, metrics.auc(fpr, tpr))
+
+
+class StreamingYYMixin:
+    """
+    Class to accumulate running sums for R2 and RMSE.
+    Mean and sum of squared deviation of ground truth are merged by Chan's parallel algorithm, which is numerically stable.
+    """
+    def update_label_state(self, state: Dict[str, float], label_name: str, pred_name_list: List[str], columns: Dict[str, np.ndarray]) -> Dict[str, float]:
+        """
+        Merge batch into running sums of label.
+
+        Args:
+            state (Dict[str, float]): number of samples, mean and sum of squared deviation of ground truth, and sum of squared error, or None at first
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label, ie. only 'pred_' + label_name
+            columns (Dict[str, np.ndarray]): columns of batch
+
+        Returns:
+            Dict[str, float]: updated running sums
+        """
+        y_obs = columns[label_name].astype(np.float64)
+        y_pred = columns['pred_' + label_name].astype(np.float64)
+        _count = len(y_obs)
+        _mean = y_obs.mean()
+        _ss_tot = np.square(y_obs - _mean).sum()
+        _ss_res = np.square(y_obs - y_pred).sum()
+        if state is None:
+            return {'count': _count, 'mean': _mean, 'ss_tot': _ss_tot, 'ss_res': _ss_res}
+
+        _delta = _mean - state['mean']
+        _new_count = state['count'] + _count
+        state['ss_tot'] = state['ss_tot'] + _ss_tot + np.square(_delta) * state['count'] * _count / _new_count
+        state['mean'] = state['mean'] + _delta * _count / _new_count
+        state['ss_res'] = state['ss_res'] + _ss_res
+        state['count'] = _new_count
+        return state
+
+    def set_label_metrics(self, label_metrics: LabelMetrics, split: str, state: Dict[str, float]) -> None:
+        """
+        Set R2 and RMSE of split from running sums.
+
+        Args:
+            label_metrics (LabelMetrics): metrics of 'val' and 'test'
+            split (str): 'val' or 'test'
+            state (Dict[str, float]): running sums, or None when no sample
+        """
+        if state is None:
+            label_metrics.set_label_metrics(split, self.metrics_kind, np.nan)
+            label_metrics.set_label_metrics(split, 'rmse', np.nan)
+            return
+
+        # As metrics.r2_score, 1.0 for perfect prediction, and 0.0 for imperfect prediction when ground truth is constant.
+        if state['ss_tot'] == 0:
+            r2 = 1.0 if state['ss_res'] == 0 else 0.0
+        else:
+            r2 = 1 - state['ss_res'] / state['ss_tot']
+        label_metrics.set_label_metrics(split, self.metrics_kind, r2)
+        label_metrics.set_label_metrics(split, 'rmse', np.sqrt(state['ss_res'] / state['count']))
+
+
+class StreamingC_IndexMixin:
+    """
+    Class to accumulate counts of distinct (period, label, pred) for C-Index,
+    which is calculated by C_IndexMixin._count_c_index_pairs() with counts as weights.
+    Rows are exact until the number of distinct rows exceeds max_exact_rows.
+    Then, edges of num_bins bins of period and pred are set at quantiles of the rows so far,
+    and period and pred are replaced with their bins, ie. ones in the same bin are regarded as tied,
+    so that the number of distinct rows is bounded by 2 * num_bins**2.
+    """
+    num_bins = 1000
+    max_exact_rows = 100000
+    max_pending_rows = 65536
+
+    @staticmethod
+    def _set_edges(values: np.ndarray, counts: np.ndarray, num_bins: int) -> np.ndarray:
+        """
+        Set edges of bins at quantiles of values weighted by counts.
+
+        Args:
+            values (np.ndarray): distinct values, or values of rows
+            counts (np.ndarray): number of samples of each value
+            num_bins (int): number of bins
+
+        Returns:
+            np.ndarray: edges, where the i-th bin has values between the (i-1)-th and the i-th edges
+        """
+        _unique_values, _inverse = np.unique(values, return_inverse=True)
+        if len(_unique_values) <= num_bins:
+            # Each distinct value has its own bin.
+            return _unique_values[1:]
+        _cum_counts = np.cumsum(np.bincount(_inverse, weights=counts))
+        _targets = np.arange(1, num_bins) / num_bins * _cum_counts[-1]
+        return np.unique(_unique_values[np.searchsorted(_cum_counts, _targets, side='right').clip(max=len(_unique_values) - 1)])
+
+    @staticmethod
+    def _to_bins(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """
+        Replace values with their bins, which keeps order of values.
+
+        Args:
+            values (np.ndarray): values
+            edges (np.ndarray): edges of bins
+
+        Returns:
+            np.ndarray: bins of values
+        """
+        return np.searchsorted(edges, values, side='right').astype(np.float64)
+
+    def update_label_state(self, state: Dict[str, Any], label_name: str, pred_name_list: List[str], columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        Add batch to counts of label.
+        Batches are kept pending, and merged into distinct rows when pending rows are more than max_pending_rows and distinct rows.
+
+        Args:
+            state (Dict[str, Any]): distinct rows of periods, labels, and preds, their counts, edges of bins, and pending batches, or None at first
+            label_name (str): label name
+            pred_name_list (List[str]): columns of prediction of label, ie. only 'pred_' + label_name
+            columns (Dict[str, np.ndarray]): columns of batch
+
+        Returns:
+            Dict[str, Any]: updated state
+        """
+        _batch = {
+                'periods': columns['periods'].astype(np.float64),
+                'labels': columns[label_name].astype(np.float64),
+                'preds': columns['pred_' + label_name].astype(np.float64),
+                'counts': np.ones(len(columns[label_name]), dtype=np.int64)
+                }
+        if state is None:
+            state = {key: values[:0] for key, values in _batch.items()}
+            state['period_edges'] = None
+            state['pred_edges'] = None
+            state['pending'] = []
+            state['num_pending'] = 0
+
+        if state['period_edges'] is not None:
+            _batch['periods'] = self._to_bins(_batch['periods'], state['period_edges'])
+            _batch['preds'] = self._to_bins(_batch['preds'], state['pred_edges'])
+
+        state['pending'].append(_batch)
+        state['num_pending'] = state['num_pending'] + len(_batch['counts'])
+        if state['num_pending'] > max(self.max_pending_rows, len(state['counts'])):
+            state = self._merge_rows(state)
+            if (state['period_edges'] is None) and (len(state['counts']) > self.max_exact_rows):
+                state = self._calibrate(state, label_name)
+        return state
+
+    def _calibrate(self, state: Dict[str, Any], label_name: str) -> Dict[str, Any]:
+        """
+        Set edges of bins from distinct rows, and replace period and pred of them with their bins.
+
+        Args:
+            state (Dict[str, Any]): state without pending batches
+            label_name (str): label name
+
+        Returns:
+            Dict[str, Any]: state of bins
+        """
+        logger.warning(
+                    f"C-Index of {label_name} is approximated with {self.num_bins} bins of period and prediction, "
+                    f"since distinct rows exceed {self.max_exact_rows}."
+                    )
+        state['period_edges'] = self._set_edges(state['periods'], state['counts'], self.num_bins)
+        state['pred_edges'] = self._set_edges(state['preds'], state['counts'], self.num_bins)
+        state['pending'] = [{
+                            'periods': self._to_bins(state['periods'], state['period_edges']),
+                            'labels': state['labels'],
+                            'preds': self._to_bins(state['preds'], state['pred_edges']),
+                            'counts': state['counts']
+                            }]
+        for key in ['periods', 'labels', 'preds', 'counts']:
+            state[key] = state[key][:0]
+        return self._merge_rows(state)
+
+    @staticmethod
+    def _merge_rows(state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merge pending batches into distinct rows of (period, label, pred) by summing their counts.
+
+        Args:
+            state (Dict[str, Any]): state
+
+        Returns:
+            Dict[str, Any]: state without pending batches
+        """
+        _keys = ['periods', 'labels', 'preds', 'counts']
+        _rows = {key: np.concatenate([state[key]] + [_batch[key] for _batch in state['pending']]) for key in _keys}
+        _order = np.lexsort((_rows['preds'], _rows['labels'], _rows['periods']))
+        _rows = {key: values[_order] for key, values in _rows.items()}
+        _is_new = np.ones(len(_order), dtype=bool)
+        _is_new[1:] = (_rows['periods'][1:] != _rows['periods'][:-1]) | (_rows['labels'][1:] != _rows['labels'][:-1]) | (_rows['preds'][1:] != _rows['preds'][:-1])
+        _starts = np.flatnonzero(_is_new)
+
+        merged = {key: _rows[key][_starts] for key in ['periods', 'labels', 'preds']}
+        merged['counts'] = np.add.reduceat(_rows['counts'], _starts) if len(_starts) > 0 else _rows['counts']
+        merged['period_edges'] = state['period_edges']
+        merged['pred_edges'] = state['pred_edges']
+        merged['pending'] = []
+        merged['num_pending'] = 0
+        return merged
+
+    def set_label_metrics(self, label_metrics: LabelMetrics, split: str, state: Dict[str, np.ndarray]) -> None:
+        """
+        Set C-Index of split from counts.
+
+        Args:
+            label_metrics (LabelMetrics): metrics of 'val' and 'test'
+            split (str): 'val' or 'test'
+            state (Dict[str, np.ndarray]): counts, or None when no sample
+        """
+        if state is None:
+            label_metrics.set_label_metrics(split, self.metrics_kind, np.nan)
+            return
+
+        state = self._merge_rows(state)
+        num_correct, num_tied, num_pairs = self._count_c_index_pairs(state['periods'], (-1)*state['preds'], state['labels'], state['counts'].reshape(1, -1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value_c_index = ((num_correct + num_tied / 2) / num_pairs)[0]
+        label_metrics.set_label_metrics(split, self.metrics_kind, value_c_index)
+
+
+class StreamingClsEval(StreamingMetricsMixin, MetricsMixin, StreamingROCMixin):
+    """
+    Class for streaming metrics for classification.
+    """
+    def __init__(self) -> None:
+        self.metrics_kind = 'auc'
+        self.extra_columns = []
+        self.num_bootstrap = 0
+        self.pred_columns = None
+        self.states = dict()
+
+
+class StreamingRegEval(StreamingMetricsMixin, MetricsMixin, StreamingYYMixin):
+    """
+    Class for streaming metrics for regression.
+    """
+    def __init__(self) -> None:
+        self.metrics_kind = 'r2'
+        self.extra_metrics_kinds = ['rmse']
+        self.extra_columns = []
+        self.num_bootstrap = 0
+        self.pred_columns = None
+        self.states = dict()
+
+
+class StreamingDeepSurvEval(StreamingMetricsMixin, MetricsMixin, StreamingC_IndexMixin, C_IndexMixin):
+    """
+    Class for streaming metrics for DeepSurv.
+    """
+    def __init__(self) -> None:
+        self.metrics_kind = 'c_index'
+        self.extra_columns = ['periods']
+        self.num_bootstrap = 0
+        self.pred_columns = None
+        self.states = dict()
+
+
+def set_streaming_eval(task: str) -> Union[StreamingClsEval, StreamingRegEval, StreamingDeepSurvEval]:
+    """
+    Set class for streaming metrics depending on task.
+
+    Args:
+        task (str): task
+
+    Returns:
+        Union[StreamingClsEval, StreamingRegEval, StreamingDeepSurvEval]: class for streaming metrics
+    """
+    if task == 'classification':
+        return StreamingClsEval()
     elif task == 'regression':
-        return RegEval()
+        return StreamingRegEval()
     elif task == 'deepsurv':
-        return DeepSurvEval()
+        return StreamingDeepSurvEval()
     else:
         raise ValueError(f"Invalid task: {task}.")
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import importlib.util
 from distutils.util import strtobool
 from pathlib import Path
 import pandas as pd
@@ -32,6 +33,18 @@ class Options:
         # GPU Ids
         self.parser.add_argument('--gpu_ids', type=str, default='cpu', help='gpu ids: e.g. 0, 0-1-2, 0-2. Use cpu for CPU (Default: cpu)')
 
+        # Mixed precision
+        self.parser.add_argument('--amp', type=str, default='no', choices=['no', 'fp16', 'bf16'], help='mixed precision: no, fp16(GPU only), or bf16 (Default: no)')
+
+        # Dataloader
+        self.parser.add_argument('--num_workers',        type=int, default=0,    metavar='N', help='number of worker processes for data loading. Set 0 to load in the main process (Default: 0)')
+        self.parser.add_argument('--pin_memory',         type=str, default='no', choices=['yes', 'no'], help='copy batches into page-locked memory before transferring to GPU: yes, no (Default: no)')
+        self.parser.add_argument('--persistent_workers', type=str, default='no', choices=['yes', 'no'], help='keep worker processes alive between epochs: yes, no (Default: no)')
+        self.parser.add_argument('--prefetch_factor',    type=int, default=2,    metavar='N', help='number of batches loaded in advance by each worker (Default: 2)')
+        self.parser.add_argument('--image_shard',        type=str, default=None,               help='directory of images packed by pack_images.py. If None, images are read from imgpath (Default: None)')
+        self.parser.add_argument('--gpu_augmentation',   type=str, default='no', choices=['yes', 'no'], help='augment and normalize a batch of image on device instead of each image on CPU: yes, no (Default: no)')
+        self.parser.add_argument('--image_cache_mb',     type=int, default=0,    metavar='N', help='memory budget in MB for caching decoded images in each process. Set 0 not to cache (Default: 0)')
+
         if isTrain:
             # Task
             self.parser.add_argument('--task', type=str, required=True, choices=['classification', 'regression', 'deepsurv'], help='Task')
@@ -39,9 +52,11 @@ class Options:
             # Model
             self.parser.add_argument('--model',      type=str, required=True, help='model: MLP, CNN, ViT, or MLP+(CNN or ViT)')
             self.parser.add_argument('--pretrained', type=strtobool, default=False, help='For use of pretrained model(CNN or ViT)')
+            self.parser.add_argument('--fused_head', type=str, default='no', choices=['yes', 'no'], help='compute outputs and losses of all labels at once: yes, no (Default: no)')
 
             # Training and Internal validation
             self.parser.add_argument('--criterion', type=str,   required=True, choices=['CEL', 'MSE', 'RMSE', 'MAE', 'NLL'], help='criterion')
+            self.parser.add_argument('--ties',      type=str,   default='breslow', choices=['breslow', 'efron'], help='handling of tied periods in NLL: breslow, efron (Default: breslow)')
             self.parser.add_argument('--optimizer', type=str,   default='Adam', choices=['SGD', 'Adadelta', 'RMSprop', 'Adam', 'RAdam'], help='optimizer')
             self.parser.add_argument('--lr',        type=float,                metavar='N', help='learning rate')
             self.parser.add_argument('--epochs',    type=int,   default=10,    metavar='N', help='number of epochs (Default: 10)')
@@ -60,6 +75,10 @@ class Options:
             self.parser.add_argument('--in_channel',         type=int,  required=True, choices=[1, 3], help='channel of input image')
             self.parser.add_argument('--vit_image_size',     type=int,  default=0,                     help='input image size for ViT. Set 0 if not used ViT (Default: 0)')
 
+            # Distributed training
+            self.parser.add_argument('--distributed',        type=str,  choices=['yes', 'no'], default='no', help='train with one process for each GPU by DistributedDataParallel: yes, no (Default: no)')
+            self.parser.add_argument('--world_size',         type=int,  default=1, metavar='N',  help='number of processes when distributed on CPU. Ignored when GPU (Default: 1)')
+
             # Weight saving strategy
             self.parser.add_argument('--save_weight_policy', type=str,  choices=['best', 'each'], default='best', help='Save weight policy: best, or each(ie. save each time loss decreases when multi-label output) (Default: best)')
 
@@ -67,6 +86,18 @@ class Options:
             # Directory of weight at training
             self.parser.add_argument('--weight_dir',         type=str,  default=None, help='directory of weight to be used when test. If None, the latest one is selected')
 
+            # Read the next weight from disk while the current one is used
+            self.parser.add_argument('--weight_prefetch',    type=str,  default='no', choices=['yes', 'no'], help='read the next weight on a background thread: yes, no (Default: no)')
+
+            # Number of weights evaluated in the same pass of data
+            self.parser.add_argument('--sweep_size',         type=int,  default=1, metavar='N', help='number of weights whose networks are kept on device and evaluated in one pass of data (Default: 1)')
+
+            # Format of likelihood
+            self.parser.add_argument('--likelihood_format',  type=str,  default='csv', choices=['csv', 'parquet', 'feather'], help='format of likelihood: csv, parquet, feather (Default: csv)')
+
+            # Metrics accumulated during test
+            self.parser.add_argument('--streaming_metrics',  type=str,  default='no', choices=['yes', 'no'], help='accumulate metrics of each group and split during test: yes, no (Default: no)')
+
             # Test bash size
             self.parser.add_argument('--test_batch_size',    type=int,  default=1, metavar='N', help='batch size for test (Default: 1)')
 
@@ -301,13 +332,19 @@ class ParamTable:
                 'model': [sa, lo, trp, tsp],
                 'vit_image_size': [mo, sa, lo, trp, tsp],
                 'pretrained': [mo, sa, trp],
+                'fused_head': [mo, trc, sa, lo, trp, tsp],
                 'mlp': [mo, dl],
                 'net': [mo, dl],
 
                 'weight_dir': [tsc, tsp],
                 'weight_paths': [tsc],
+                'weight_prefetch': [tsc, tsp],
+                'sweep_size': [tsc, tsp],
+                'likelihood_format': [tsc, tsp],
+                'streaming_metrics': [tsc, tsp],
 
                 'criterion': [trc, sa, trp],
+                'ties': [trc, sa, trp],
                 'optimizer': [trc, sa, trp],
                 'lr': [trc, sa, trp],
                 'epochs': [trc, sa, trp],
@@ -317,10 +354,18 @@ class ParamTable:
                 'test_splits': [tsc, tsp],
 
                 'in_channel': [mo, dl, sa, lo, trp, tsp],
-                'normalize_image': [dl, sa, lo, trp, tsp],
-                'augmentation': [dl, sa, trp],
+                'normalize_image': [mo, dl, sa, lo, trp, tsp],
+                'augmentation': [mo, dl, sa, trp],
                 'sampler': [dl, sa, trp],
 
+                'num_workers': [dl, trp, tsp],
+                'pin_memory': [dl, trp, tsp],
+                'persistent_workers': [dl, trp, tsp],
+                'prefetch_factor': [dl, trp, tsp],
+                'image_cache_mb': [dl, trp, tsp],
+                'image_shard': [dl, trp, tsp],
+                'gpu_augmentation': [mo, dl, trp, tsp],
+
                 'df_source': [dl],
                 'label_list': [dl, trc, sa, lo],
                 'input_list': [dl, sa, lo],
@@ -333,6 +378,9 @@ class ParamTable:
                 'save_datetime_dir': [trc, tsc, trp, tsp],
 
                 'gpu_ids': [trc, tsc, sa, trp, tsp],
+                'distributed': [dl, trc, trp],
+                'world_size': [trc, trp],
+                'amp': [trc, tsc, trp, tsp],
                 'device': [mo, trc, tsc],
                 'dataset_info': [trc, sa, trp, tsp]
                 }
@@ -572,6 +620,18 @@ def _train_parse(args: argparse.Namespace) -> Dict[str, ParamSet]:
             }
 
 
+def _check_likelihood_format(likelihood_format: str) -> None:
+    """
+    Check if pyarrow is installed when likelihood is written in parquet or feather,
+    so that test fails before inference rather than when likelihood is written.
+
+    Args:
+        likelihood_format (str): 'csv', 'parquet', or 'feather'
+    """
+    if (likelihood_format != 'csv') and (importlib.util.find_spec('pyarrow') is None):
+        raise ImportError(f"pyarrow is required for likelihood_format {likelihood_format}. Install pyarrow, or use likelihood_format csv.")
+
+
 def _test_parse(args: argparse.Namespace) -> Dict[str, ParamSet]:
     """
     Parse parameters required at test.
@@ -591,6 +651,8 @@ def _test_parse(args: argparse.Namespace) -> Dict[str, ParamSet]:
         args.weight_dir = _get_latest_weight_dir()
     args.weight_paths = _collect_weight_paths(args.weight_dir)
 
+    _check_likelihood_format(args.likelihood_format)
+
     # Get datetime at training
     _train_datetime_dir = Path(args.weight_dir).parents[0]
     _train_datetime = _train_datetime_dir.name
@@ -603,9 +665,14 @@ def _test_parse(args: argparse.Namespace) -> Dict[str, ParamSet]:
     for _param, _arg in params.items():
         setattr(args, _param, _arg)
 
+    # Weight trained before fused_head was added has a classifier for each label.
+    if not hasattr(args, 'fused_head'):
+        args.fused_head = 'no'
+
     # When test, the followings are always fixed.
     args.augmentation = 'no'
     args.sampler = 'no'
+    args.distributed = 'no'
     args.pretrained = False
 
     args.mlp, args.net = _parse_model(args.model)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import json
+import sqlite3
+import pandas as pd
+from .logger import BaseLogger
+
+
+logger = BaseLogger.get_logger(__name__)
+
+
+class SummaryStore:
+    """
+    Class to append summary of metrics into SQLite database, and export it into csv.
+
+    Each row of summary is stored as JSON with its datetime, weight, and group, which are indexed for lookup.
+    Rows are appended in a transaction, and SQLite locks the database file, so that evaluations can run concurrently.
+    summary.csv of the previous version is imported when the database is created.
+    """
+    db_name = 'summary.db'
+    csv_name = 'summary.csv'
+    timeout = 60.0  # Seconds to wait for lock by another evaluation
+
+    def __init__(self, summary_dir: Path) -> None:
+        """
+        Args:
+            summary_dir (Path): path to directory of summary
+        """
+        self.summary_dir = Path(summary_dir)
+        self.db_path = Path(self.summary_dir, self.db_name)
+        self.csv_path = Path(self.summary_dir, self.csv_name)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Connect to database, and create table when it does not exist.
+
+        Returns:
+            sqlite3.Connection: connection, which is in autocommit mode to handle transaction explicitly
+        """
+        self.summary_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+
+        # user_version is 0 only when database is new. Checked after lock, since another process may have created it.
+        # Committed, or rolled back when error, on exit of with statement.
+        if conn.execute('PRAGMA user_version').fetchone()[0] == 0:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                if conn.execute('PRAGMA user_version').fetchone()[0] == 0:
+                    conn.execute(
+                                'CREATE TABLE IF NOT EXISTS summary ('
+                                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                                'datetime TEXT NOT NULL, '
+                                'weight TEXT NOT NULL, '
+                                'group_name TEXT NOT NULL, '
+                                'row TEXT NOT NULL)'
+                                )
+                    conn.execute('CREATE INDEX IF NOT EXISTS summary_index ON summary (datetime, weight, group_name)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS summary_group_index ON summary (group_name)')
+                    if self.csv_path.exists():
+                        self._insert(conn, self._read_csv(self.csv_path))
+                        logger.info(f"Imported {self.csv_path} into {self.db_path}.")
+                    conn.execute('PRAGMA user_version = 1')
+        return conn
+
+    @staticmethod
+    def _read_csv(csv_path: Path) -> pd.DataFrame:
+        """
+        Read summary in csv as text, so that metrics are stored as they are written.
+
+        Args:
+            csv_path (Path): path to summary.csv
+
+        Returns:
+            pd.DataFrame: summary
+        """
+        return pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, df_summary: pd.DataFrame) -> None:
+        """
+        Insert rows of summary.
+        Empty values, ie. metrics of labels which the row does not have, are not stored.
+
+        Args:
+            conn (sqlite3.Connection): connection
+            df_summary (pd.DataFrame): summary
+        """
+        _rows = []
+        for row in df_summary.to_dict(orient='records'):
+            _row = {column_name: value for column_name, value in row.items() if not (pd.isna(value) or value == '')}
+            _rows.append((str(row['datetime']), str(row['weight']), str(row['group']), json.dumps(_row)))
+        conn.executemany('INSERT INTO summary (datetime, weight, group_name, row) VALUES (?, ?, ?, ?)', _rows)
+
+    def append(self, df_summary: pd.DataFrame) -> None:
+        """
+        Append summary.
+
+        Args:
+            df_summary (pd.DataFrame): summary to be appended
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                self._insert(conn, df_summary)
+        finally:
+            conn.close()
+
+    def find(self, datetime: str = None, weight: str = None, group: str = None) -> pd.DataFrame:
+        """
+        Return rows of summary which match all of the given datetime, weight, and group.
+
+        Args:
+            datetime (str, optional): datetime of trial, eg. '2022-01-01-00-00-00'. Defaults to None, ie. any datetime.
+            weight (str, optional): weight, eg. 'weight_epoch-010_best.pt'. Defaults to None, ie. any weight.
+            group (str, optional): group. Defaults to None, ie. any group.
+
+        Returns:
+            pd.DataFrame: summary in the same layout as summary.csv
+        """
+        _conditions = []
+        _params = []
+        for column_name, value in [('datetime', datetime), ('weight', weight), ('group_name', group)]:
+            if value is not None:
+                _conditions.append(column_name + ' = ?')
+                _params.append(value)
+        _where = (' WHERE ' + ' AND '.join(_conditions)) if _conditions else ''
+
+        conn = self._connect()
+        try:
+            _rows = conn.execute('SELECT row FROM summary' + _where + ' ORDER BY id', _params).fetchall()
+        finally:
+            conn.close()
+        # Columns are ordered by when they first appear, as if rows were concatenated one after another.
+        return pd.DataFrame([json.loads(row) for row, in _rows])
+
+    def export(self, csv_path: Path = None) -> Path:
+        """
+        Export all rows of summary into csv in order of appending.
+
+        Args:
+            csv_path (Path, optional): path to csv. Defaults to None, ie. summary.csv in summary_dir.
+
+        Returns:
+            Path: path to csv
+        """
+        if csv_path is None:
+            csv_path = self.csv_path
+        df_summary = self.find()
+        df_summary.to_csv(csv_path, index=False)
+        logger.info(f"Exported {len(df_summary)} rows of summary into {csv_path}.")
+        return csv_path
+
+
+def set_summary_store(summary_dir: Path) -> SummaryStore:
+    """
+    Set store of summary.
+
+    Args:
+        summary_dir (Path): path to directory of summary
+
+    Returns:
+        SummaryStore: store of summary
+    """
+    return SummaryStore(summary_dir)
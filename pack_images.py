@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+from lib import (
+        pack_image_shard,
+        BaseLogger
+        )
+
+
+logger = BaseLogger.get_logger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse options for packing images.
+
+    Returns:
+        argparse.Namespace: arguments
+    """
+    parser = argparse.ArgumentParser(description='Pack images of csv into a single memory-mapped array')
+    parser.add_argument('--csvpath',    type=str, required=True, help='path to csv which contains imgpath')
+    parser.add_argument('--shard_dir',  type=str, required=True, help='directory to save packed images')
+    parser.add_argument('--in_channel', type=int, required=True, choices=[1, 3], help='channel of input image')
+    args = parser.parse_args()
+    return args
+
+
+def main(args: argparse.Namespace) -> None:
+    pack_image_shard(args.csvpath, args.shard_dir, args.in_channel)
+
+
+if __name__ == '__main__':
+    try:
+        logger.info('\nPacking started.\n')
+
+        args = parse_args()
+        main(args)
+
+    except Exception as e:
+        logger.error(e, exc_info=True)
+
+    else:
+        logger.info('\nPacking finished.\n')
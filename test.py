@@ -2,15 +2,19 @@
 # -*- coding: utf-8 -*-
 
 from pathlib import Path
+import copy
+import itertools
 import torch
 from lib import (
         set_options,
         create_model,
         print_parameter,
         create_dataloader,
+        iterate_weights,
+        set_streaming_eval,
         BaseLogger
         )
-from lib.component import set_likelihood
+from lib.component import set_likelihood, set_likelihood_writer, set_mixed_precision
 
 
 logger = BaseLogger.get_logger(__name__)
@@ -28,36 +32,51 @@ def main(
     test_splits = args_conf.test_splits
     save_datetime_dir = args_conf.save_datetime_dir
 
+    # The network is built and moved to device only once, and each weight is copied into it.
     model = create_model(args_model)
+    model.to_gpu(args_conf.gpu_ids)
+    model.eval()
     dataloaders = {split: create_dataloader(args_dataloader, split=split) for split in test_splits}
     likelihood = set_likelihood(args_conf.task, args_conf.num_outputs_for_label)
+    mixed_precision = set_mixed_precision(args_conf.amp, args_conf.device)
+
+    save_dir = Path(save_datetime_dir, 'likelihoods')
+    save_dir.mkdir(parents=True, exist_ok=True)
+
+    # Networks of sweep_size weights are kept on device, and each batch is passed to all of them,
+    # so that data is read only once for them.
+    sweep_size = max(1, min(args_conf.sweep_size, len(args_conf.weight_paths)))
+    models = [model] + [copy.deepcopy(model) for _ in range(sweep_size - 1)]
+
+    weights = iterate_weights(args_conf.weight_paths, prefetch=(args_conf.weight_prefetch == 'yes'))
+    for _ in range(0, len(args_conf.weight_paths), sweep_size):
+        sweep = []
+        for _model, (weight_path, weight) in zip(models, itertools.islice(weights, sweep_size)):
+            _model.set_weight(weight)
+            save_path = Path(save_dir, 'likelihood_' + Path(weight_path).stem)
+            writer = set_likelihood_writer(likelihood, save_path, likelihood_format=args_conf.likelihood_format)
+            streaming_eval = set_streaming_eval(args_conf.task) if (args_conf.streaming_metrics == 'yes') else None
+            sweep.append((_model, writer, streaming_eval))
 
-    for weight_path in args_conf.weight_paths:
         logger.info(f"Inference ...")
-        model.load_weight(weight_path)
-        model.to_gpu(args_conf.gpu_ids)
-        model.eval()
-
-        for i, split in enumerate(test_splits):
-            for j, data in enumerate(dataloaders[split]):
+        for split in test_splits:
+            for data in dataloaders[split]:
                 in_data, _ = model.set_data(data)
 
-                with torch.no_grad():
-                    outputs = model(in_data)
-
-                # Make a new likelihood every batch
-                df_likelihood = likelihood.make_format(data, outputs)
+                for _model, writer, streaming_eval in sweep:
+                    with torch.no_grad(), mixed_precision.autocast():
+                        outputs = _model(in_data)
 
-                if i + j == 0:
-                    save_dir = Path(save_datetime_dir, 'likelihoods')
-                    save_dir.mkdir(parents=True, exist_ok=True)
-                    save_path = Path(save_dir, 'likelihood_' + Path(weight_path).stem + '.csv')
-                    df_likelihood.to_csv(save_path, index=False)
-                else:
-                    df_likelihood.to_csv(save_path, mode='a', index=False, header=False)
+                    # Likelihood is buffered, and written in chunks.
+                    columns = likelihood.make_columns(data, outputs)
+                    writer.write_columns(columns)
+                    if streaming_eval is not None:
+                        streaming_eval.update(columns)
 
-        # Reset the current weight by initializing network.
-        model.init_network()
+        for _, writer, streaming_eval in sweep:
+            writer.close()
+            if streaming_eval is not None:
+                streaming_eval.make_metrics(writer.save_path)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import copy
+import socket
+import sys
+import numpy as np
+import pandas as pd
+import torch
+import torch.multiprocessing as mp
+import train as train_module
+from lib import set_options
+
+
+WORLD_SIZE = 2
+EPOCHS = 3
+
+
+def _make_csv(csv_path: Path, num_samples: int = 96) -> None:
+    """
+    Make csv of classification with only inputs, which is trained with MLP.
+    """
+    rng = np.random.default_rng(0)
+    df_source = pd.DataFrame({
+                            'uniqID': [str(i).zfill(4) for i in range(num_samples)],
+                            'imgpath': ['dummy_' + str(i).zfill(4) + '.png' for i in range(num_samples)],
+                            'label_A': rng.integers(0, 2, num_samples),
+                            'input_x': rng.normal(size=num_samples),
+                            'input_y': rng.normal(size=num_samples),
+                            'split': rng.choice(['train', 'val', 'test'], num_samples, p=[0.6, 0.2, 0.2]),
+                            'group': 'groupA'
+                            })
+    df_source.to_csv(csv_path, index=False)
+
+
+def _train_worker(rank: int, world_size: int, args: dict, result_dir: str) -> None:
+    """
+    Run train_worker() of train.py, and save epoch losses and weights at each epoch of the process.
+    """
+    captured = {'weights': []}
+    _create_model = train_module.create_model
+    _set_loss_store = train_module.set_loss_store
+    _create_dataloader = train_module.create_dataloader
+
+    def create_model(params):
+        captured['model'] = _create_model(params)
+        return captured['model']
+
+    def set_loss_store(*args, **kwargs):
+        loss_store = _set_loss_store(*args, **kwargs)
+        _cal_epoch_loss = loss_store.cal_epoch_loss
+
+        def cal_epoch_loss(at_epoch=None):
+            _cal_epoch_loss(at_epoch=at_epoch)
+            captured['weights'].append(copy.deepcopy(captured['model'].network.module.state_dict()))
+
+        loss_store.cal_epoch_loss = cal_epoch_loss
+        captured['loss_store'] = loss_store
+        return loss_store
+
+    def create_dataloader(params, split=None):
+        split_loader = _create_dataloader(params, split=split)
+        if split == 'val':
+            captured['val_indices'] = list(split_loader.sampler.sampler)
+        return split_loader
+
+    train_module.create_model = create_model
+    train_module.create_dataloader = create_dataloader
+    train_module.set_loss_store = set_loss_store
+    train_module.train_worker(rank, world_size, **args)
+
+    _total = captured['loss_store'].label_losses['total']
+    torch.save(
+            {
+                'train_epoch_loss': _total.get_loss('train', 'epoch'),
+                'val_epoch_loss': _total.get_loss('val', 'epoch'),
+                'weights': captured['weights'],
+                'val_indices': captured['val_indices']
+            },
+            Path(result_dir, 'rank_' + str(rank) + '.pt')
+            )
+
+
+def _find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_distributed_training_on_gloo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('MASTER_ADDR', '127.0.0.1')
+    monkeypatch.setenv('MASTER_PORT', str(_find_free_port()))
+    _make_csv(Path(tmp_path, 'source.csv'))
+    monkeypatch.setattr(sys, 'argv', [
+                                    'train.py',
+                                    '--csvpath', 'source.csv',
+                                    '--task', 'classification',
+                                    '--model', 'MLP',
+                                    '--criterion', 'CEL',
+                                    '--epochs', str(EPOCHS),
+                                    '--batch_size', '8',
+                                    '--in_channel', '1',
+                                    '--distributed', 'yes',
+                                    '--world_size', str(WORLD_SIZE)
+                                    ])
+    args = set_options(datetime_name='2000-01-01-00-00-00', phase='train')
+    args.pop('args_print')
+
+    mp.spawn(_train_worker, args=(WORLD_SIZE, args, str(tmp_path)), nprocs=WORLD_SIZE)
+
+    results = [torch.load(Path(tmp_path, 'rank_' + str(rank) + '.pt')) for rank in range(WORLD_SIZE)]
+    for result in results[1:]:
+        # Epoch losses are summed over all processes by all_reduce_sum().
+        assert result['train_epoch_loss'] == results[0]['train_epoch_loss']
+        assert result['val_epoch_loss'] == results[0]['val_epoch_loss']
+        assert len(result['weights']) == EPOCHS
+        for weight, weight_0 in zip(result['weights'], results[0]['weights']):
+            assert all(torch.equal(weight[key], weight_0[key]) for key in weight_0)
+
+    # Each sample of val is evaluated only once over all processes.
+    _num_val = args['args_conf'].dataset_info['val']
+    assert sorted(index for result in results for index in result['val_indices']) == list(range(_num_val))
+
+    # Weight saved by the main process is the same as weight of every process at the best epoch.
+    _weight_paths = list(Path(tmp_path, 'results', 'source', 'trials', '2000-01-01-00-00-00', 'weights').glob('*_best.pt'))
+    assert len(_weight_paths) == 1
+    _best_epoch = int(_weight_paths[0].stem.split('-')[1].split('_')[0])
+    saved_weight = torch.load(_weight_paths[0])
+    for result in results:
+        assert all(torch.equal(saved_weight[key], result['weights'][_best_epoch - 1][key]) for key in saved_weight)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+from lib.metrics import ClsEval, StreamingClsEval, StreamingDeepSurvEval, C_IndexMixin
+
+
+def _make_columns(num_samples: int, seed: int = 0):
+    """
+    Make columns of likelihood of classification, whose predictions are logits as written by test.py.
+    """
+    rng = np.random.default_rng(seed)
+    columns = dict()
+    columns['group'] = rng.choice(['groupA', 'groupB'], num_samples).astype(object)
+    columns['split'] = rng.choice(['val', 'test'], num_samples).astype(object)
+    columns['label_A'] = rng.integers(0, 2, num_samples)
+    columns['pred_label_A_0'] = (rng.normal(size=num_samples) * 3).astype(np.float32)
+    columns['pred_label_A_1'] = (rng.normal(size=num_samples) * 3 + columns['label_A']).astype(np.float32)
+    columns['label_B'] = rng.integers(0, 4, num_samples)
+    for i in range(4):
+        columns['pred_label_B_' + str(i)] = (rng.normal(size=num_samples) * 2 + (columns['label_B'] == i)).astype(np.float32)
+    return columns
+
+
+@pytest.mark.parametrize('num_samples, batch_size', [(2000, 1), (100000, 256)])
+def test_streaming_auc_matches_batch_auc(num_samples, batch_size):
+    columns = _make_columns(num_samples)
+    batch_metrics = ClsEval().cal_whole_metrics(pd.DataFrame(columns))
+
+    streaming_eval = StreamingClsEval()
+    for start in range(0, num_samples, batch_size):
+        streaming_eval.update({column_name: values[start:start + batch_size] for column_name, values in columns.items()})
+    streaming_metrics = streaming_eval.cal_whole_metrics()
+
+    # Scores in the same bin are regarded as tied.
+    for group, group_metrics in batch_metrics.items():
+        for label_name, label_metrics in group_metrics.items():
+            for split in ['val', 'test']:
+                assert streaming_metrics[group][label_name].get_label_metrics(split, 'auc') == pytest.approx(
+                                                                                            label_metrics.get_label_metrics(split, 'auc'),
+                                                                                            abs=1 / StreamingClsEval.num_bins
+                                                                                            )
+
+
+@pytest.mark.parametrize('spread', [0.2, 50])
+@pytest.mark.parametrize('max_exact_rows', [StreamingDeepSurvEval.max_exact_rows, 2000])
+def test_streaming_c_index_matches_c_index(spread, max_exact_rows):
+    # Risk is clustered when spread is small, and periods are continuous.
+    num_samples = 20000
+    rng = np.random.default_rng(0)
+    preds = rng.normal(300, spread, num_samples).astype(np.float32)
+    periods = rng.exponential(np.exp(-(preds - 300) / spread)) * 100
+    labels = (rng.random(num_samples) < 0.6).astype(np.int64)
+    columns = {
+            'group': np.full(num_samples, 'groupA', dtype=object),
+            'split': np.full(num_samples, 'test', dtype=object),
+            'periods': periods,
+            'label_A': labels,
+            'pred_label_A': preds
+            }
+    c_index = C_IndexMixin._cal_c_index(periods, preds, labels)
+
+    streaming_eval = StreamingDeepSurvEval()
+    streaming_eval.max_exact_rows = max_exact_rows
+    streaming_eval.max_pending_rows = 1000
+    for start in range(0, num_samples, 64):
+        streaming_eval.update({column_name: values[start:start + 64] for column_name, values in columns.items()})
+    streaming_c_index = streaming_eval.cal_whole_metrics()['groupA']['label_A'].get_label_metrics('test', 'c_index')
+
+    if max_exact_rows >= num_samples:
+        assert streaming_c_index == c_index
+    else:
+        # Periods and preds in the same bin are regarded as tied.
+        assert streaming_c_index == pytest.approx(c_index, abs=2 / StreamingDeepSurvEval.num_bins)
@@ -3,48 +3,59 @@
 
 import datetime
 import torch
+import torch.multiprocessing as mp
 from lib import (
         set_options,
         create_model,
         print_parameter,
         save_parameter,
         create_dataloader,
+        set_sampler_epoch,
+        get_world_size,
+        set_master_address,
+        setup_process_group,
+        cleanup_process_group,
+        is_main_process,
         BaseLogger
         )
 
 from lib.component import (
             set_criterion,
             set_optimizer,
-            set_loss_store
+            set_loss_store,
+            set_mixed_precision
         )
 
 
 logger = BaseLogger.get_logger(__name__)
 
 
-def main(
+def train(
         args_model = None,
         args_dataloader = None,
         args_conf = None,
-        args_print = None,
         args_save = None
         ):
 
-    print_parameter(args_print)
-
     isMLP = args_model.mlp is not None
+    isDistributed = args_conf.distributed == 'yes'
     save_weight_policy = args_conf.save_weight_policy
     save_datetime_dir = args_conf.save_datetime_dir
 
     model = create_model(args_model)
-    model.to_gpu(args_conf.gpu_ids)
+    if isDistributed:
+        model.to_distributed()
+    else:
+        model.to_gpu(args_conf.gpu_ids)
     dataloaders = {split: create_dataloader(args_dataloader, split=split) for split in ['train', 'val']}
 
-    criterion = set_criterion(args_conf.criterion, args_conf.device)
+    criterion = set_criterion(args_conf.criterion, args_conf.device, ties=args_conf.ties, fused=(args_conf.fused_head == 'yes'))
     loss_store = set_loss_store(args_conf.label_list, args_conf.epochs, args_conf.dataset_info)
     optimizer = set_optimizer(args_conf.optimizer, model.network, args_conf.lr)
+    mixed_precision = set_mixed_precision(args_conf.amp, args_conf.device)
 
     for epoch in range(1, args_conf.epochs + 1):
+        set_sampler_epoch(dataloaders['train'], epoch)
         for phase in ['train', 'val']:
             if phase == 'train':
                 model.train()
@@ -59,23 +70,33 @@ def main(
 
                 in_data, labels = model.set_data(data)
                 with torch.set_grad_enabled(phase == 'train'):
-                    outputs = model(in_data)
-                    losses = criterion(outputs, labels)
+                    with mixed_precision.autocast():
+                        outputs = model(in_data)
+                        losses = criterion(outputs, labels)
 
                     if phase == 'train':
                         loss = losses['total']
-                        loss.backward()
-                        optimizer.step()
+                        mixed_precision.backward(loss)
+                        mixed_precision.step(optimizer)
 
                 loss_store.store(phase, losses, batch_size=len(data['imgpath']))
 
+        # Losses are summed over all processes when distributed.
         loss_store.cal_epoch_loss(at_epoch=epoch)
+
+        # Only the main process prints and saves when distributed.
+        if not is_main_process():
+            continue
+
         loss_store.print_epoch_loss(at_epoch=epoch)
         if loss_store.is_val_loss_updated():
             model.store_weight(at_epoch=loss_store.get_best_epoch())
             if (epoch > 1) and (save_weight_policy == 'each'):
                 model.save_weight(save_datetime_dir, as_best=False)
 
+    if not is_main_process():
+        return
+
     save_parameter(args_save, save_datetime_dir + '/' + 'parameters.json')
     loss_store.save_learning_curve(save_datetime_dir)
     model.save_weight(save_datetime_dir, as_best=True)
@@ -83,6 +104,49 @@ def main(
         dataloaders['train'].dataset.save_scaler(save_datetime_dir + '/' + 'scaler.pkl')
 
 
+def train_worker(
+                rank,
+                world_size,
+                args_model = None,
+                args_dataloader = None,
+                args_conf = None,
+                args_save = None
+                ):
+    """
+    Train in one of processes when distributed.
+    """
+    device = setup_process_group(rank, world_size, args_conf.gpu_ids)
+    args_model.device = device
+    args_conf.device = device
+    try:
+        train(args_model=args_model, args_dataloader=args_dataloader, args_conf=args_conf, args_save=args_save)
+    finally:
+        cleanup_process_group()
+
+
+def main(
+        args_model = None,
+        args_dataloader = None,
+        args_conf = None,
+        args_print = None,
+        args_save = None
+        ):
+
+    print_parameter(args_print)
+
+    if args_conf.distributed == 'yes':
+        # One process for each GPU, or world_size processes on CPU.
+        world_size = get_world_size(args_conf.gpu_ids, args_conf.world_size)
+        set_master_address()
+        mp.spawn(
+                train_worker,
+                args=(world_size, args_model, args_dataloader, args_conf, args_save),
+                nprocs=world_size
+                )
+    else:
+        train(args_model=args_model, args_dataloader=args_dataloader, args_conf=args_conf, args_save=args_save)
+
+
 if __name__ == '__main__':
     try:
         datetime_name = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')